@@ -0,0 +1,201 @@
+"""
+Answers many degrees queries in one run, writing one JSON line per pair.
+
+Usage: python batch.py [--workers N] directory [pairs.csv]
+
+Each row of the pairs file (or standard input) holds a source name and a
+target name. Pairs that share a source are answered from one
+breadth-first search tree. With --workers, those searches run in a pool
+of processes that share the loaded graph.
+"""
+import csv
+import json
+import multiprocessing
+import os
+import sys
+from itertools import islice
+
+import degrees
+from graph import tree_path
+
+# Number of pairs grouped and answered together before writing them out
+CHUNK_SIZE = 10000
+
+
+def main():
+    usage = "Usage: python batch.py [--workers N] directory [pairs.csv]"
+    args = sys.argv[1:]
+    workers = 1
+    if args[:1] == ["--workers"]:
+        try:
+            workers = int(args[1])
+        except (IndexError, ValueError):
+            sys.exit(usage)
+        args = args[2:]
+    if len(args) not in [1, 2] or workers < 1:
+        sys.exit(usage)
+    directory = args[0]
+
+    degrees.load_data(directory, compact=True)
+
+    if len(args) == 2:
+        with open(args[1], encoding="utf-8", newline="") as f:
+            run_batch(degrees.graph, read_pairs(f), sys.stdout, workers, directory)
+    else:
+        run_batch(degrees.graph, read_pairs(sys.stdin), sys.stdout, workers, directory)
+
+
+def read_pairs(f):
+    """
+    Yields (source, target) name pairs from a CSV file, skipping blank
+    rows and an optional "source,target" header.
+    """
+    for row in csv.reader(f):
+        if len(row) < 2:
+            continue
+        source, target = row[0].strip(), row[1].strip()
+        if (source.lower(), target.lower()) == ("source", "target"):
+            continue
+        yield source, target
+
+
+def run_batch(graph, pairs, out, workers=1, directory=None):
+    """
+    Answers every (source, target) pair and writes the results to `out`
+    as JSON lines, in the same order as the pairs.
+
+    With more than one worker, the searches run in a process pool.
+    Forked workers share `graph` with this process copy-on-write.
+    Where processes are spawned instead, each worker memory-maps the
+    snapshot in `directory`, so the adjacency pages are still shared.
+    """
+    pool = None
+    if workers > 1:
+        pool = make_pool(workers, directory)
+
+    try:
+        pairs = iter(pairs)
+        while True:
+            chunk = list(islice(pairs, CHUNK_SIZE))
+            if not chunk:
+                break
+            for result in answer_chunk(graph, chunk, pool):
+                out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def make_pool(workers, directory):
+    """
+    Returns a pool of `workers` processes that can see the loaded graph.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    return context.Pool(workers, initializer=init_worker, initargs=(directory,))
+
+
+def init_worker(directory):
+    """
+    Loads the graph in a worker that did not inherit it from a fork.
+    """
+    if degrees.graph is None:
+        degrees.load_data(directory, compact=True)
+
+
+def solve_group(group):
+    """
+    Answers one (source, queries) group inside a worker process.
+    """
+    source, queries = group
+    return list(answer_group(degrees.graph, source, queries))
+
+
+def answer_chunk(graph, chunk, pool=None):
+    """
+    Returns the results for a list of (source, target) name pairs,
+    running one search per distinct source.
+    """
+    results = [None] * len(chunk)
+
+    # Maps each source person int to the (position, target int) it is asked about
+    groups = {}
+
+    for position, (source_name, target_name) in enumerate(chunk):
+        result = {"source": source_name, "target": target_name}
+        results[position] = result
+
+        source = resolve(graph, source_name, result, "source")
+        target = resolve(graph, target_name, result, "target")
+        if source is None or target is None:
+            continue
+        groups.setdefault(source, []).append((position, target))
+
+    if pool is None:
+        answers = (answer_group(graph, source, queries) for source, queries in groups.items())
+    else:
+        # Results are put back by position, so finishing order does not matter
+        chunksize = max(1, len(groups) // (4 * (os.cpu_count() or 1)))
+        answers = pool.imap_unordered(solve_group, groups.items(), chunksize)
+
+    for answer in answers:
+        for position, path in answer:
+            add_path(graph, results[position], path)
+
+    return results
+
+
+def answer_group(graph, source, queries):
+    """
+    Yields (position, path) for every (position, target) query that
+    shares `source`, from a single breadth-first search tree.
+    """
+    if len(queries) == 1:
+        position, target = queries[0]
+        yield position, graph.shortest_int_path(source, target)
+        return
+
+    parents = graph.bfs_tree(source, [target for _, target in queries])
+    for position, target in queries:
+        yield position, tree_path(parents, target)
+
+
+def resolve(graph, name, result, role):
+    """
+    Returns the person int for a name, or None after recording in
+    `result` that nobody has that name.
+
+    When several people share the name, the one in the most movies is
+    used and the number of people with that name is recorded.
+    """
+    people = graph.name_index.exact(name)
+    if len(people) == 0:
+        result["error"] = f"{role} not found"
+        return None
+    if len(people) > 1:
+        result[f"{role}_matches"] = len(people)
+    person = min(people, key=lambda p: (-graph.movie_count(p), graph.person_ids[p]))
+    result[f"{role}_id"] = graph.person_ids[person]
+    return person
+
+
+def add_path(graph, result, path):
+    """
+    Records a (movie, person) int path, or None, in `result`.
+    """
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            [graph.movie_ids[movie], graph.person_ids[person]] for movie, person in path
+        ]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 import csv
 import sys
 
+from graph import CompactGraph
+from landmarks import guided_path, load_index, save_index
+from names import NameIndex
+import paths
+from paths import SLACK, ShortestPaths
+from snapshot import load_graph, save_snapshot
+from updates import apply_delta, update_landmarks
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,11 +19,41 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed graph, used instead of the dicts above when loaded
+graph = None
 
-def load_data(directory):
+# Number of star rows that referred to an unknown person or movie
+skipped_stars = 0
+
+# Landmark index over the compact graph, if one was built for it
+landmarks = None
+
+# Name index over the people dict with the person_ids it refers to,
+# built the first time a search needs it
+name_index = None
+
+# CompactGraph copy of the dicts, for searches that only run on one
+dict_graph = None
+
+
+def load_data(directory, compact=False):
     """
     Load data from CSV files into memory.
+
+    If `compact` is True, the data is kept in a CompactGraph instead
+    of the `names`, `people` and `movies` dicts. The graph is saved to a
+    snapshot next to the CSV files, and later runs memory-map that
+    snapshot instead of parsing the CSV files again, until they change.
+    A landmark index saved with the snapshot is loaded along with it.
     """
+    global graph, landmarks, skipped_stars
+
+    if compact:
+        graph = load_graph(directory, lambda: build_graph(directory))
+        landmarks = load_index(directory, graph)
+        skipped_stars = graph.skipped_stars
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -49,25 +86,129 @@ def load_data(directory):
                 people[row["person_id"]]["movies"].add(row["movie_id"])
                 movies[row["movie_id"]]["stars"].add(row["person_id"])
             except KeyError:
-                pass
+                skipped_stars += 1
+
+
+def build_graph(directory):
+    """
+    Parses the CSV files in `directory` into a CompactGraph.
+    """
+    return CompactGraph.from_csv(directory)
+
+
+def apply_updates(changes, directory=None):
+    """
+    Applies a list of delta changes, see `updates.read_delta`, to the
+    loaded data without loading it again.
+
+    A compact graph is rebuilt with the changes, and only the landmarks
+    whose distances they touch are searched again. If `directory` is
+    given, the snapshot and landmark index there are saved again too.
+
+    Returns a dictionary with the number of edges changed, star changes
+    skipped and landmarks searched again.
+    """
+    global graph, landmarks, skipped_stars, name_index, dict_graph
+
+    # Both were built from the data as it was
+    name_index = None
+    dict_graph = None
+
+    if graph is None:
+        edges, skipped = update_dicts(changes)
+        skipped_stars += skipped
+        return {"edges": edges, "skipped": skipped, "landmarks": 0}
+
+    graph, edges, removed, skipped = apply_delta(graph, changes)
+    skipped_stars = graph.skipped_stars
+    searched = 0
+    if landmarks is not None:
+        landmarks, searched = update_landmarks(landmarks, graph, edges, removed)
+
+    if directory is not None:
+        save_snapshot(graph, directory)
+        if landmarks is not None:
+            save_index(landmarks, directory)
+
+    return {"edges": len(edges), "skipped": skipped, "landmarks": searched}
+
+
+def update_dicts(changes):
+    """
+    Applies delta changes to the `names`, `people` and `movies` dicts.
+
+    Returns the number of edges changed and of star changes skipped.
+    """
+    edges = 0
+    skipped = 0
+    for change in changes:
+        op = change["op"]
+
+        if op == "add_person":
+            person_id = change["id"]
+            if person_id in people:
+                names[people[person_id]["name"].lower()].discard(person_id)
+            else:
+                people[person_id] = {"movies": set()}
+            people[person_id]["name"] = change.get("name", "")
+            people[person_id]["birth"] = change.get("birth", "")
+            names.setdefault(people[person_id]["name"].lower(), set()).add(person_id)
+
+        elif op == "add_movie":
+            movie = movies.setdefault(change["id"], {"stars": set()})
+            movie["title"] = change.get("title", "")
+            movie["year"] = change.get("year", "")
+
+        elif op == "remove_person":
+            person = people.pop(change["id"], None)
+            if person is not None:
+                names[person["name"].lower()].discard(change["id"])
+                for movie_id in person["movies"]:
+                    movies[movie_id]["stars"].discard(change["id"])
+                edges += len(person["movies"])
+
+        elif op == "remove_movie":
+            movie = movies.pop(change["id"], None)
+            if movie is not None:
+                for person_id in movie["stars"]:
+                    people[person_id]["movies"].discard(change["id"])
+                edges += len(movie["stars"])
+
+        else:
+            person_id = change["person_id"]
+            movie_id = change["movie_id"]
+            if person_id not in people or movie_id not in movies:
+                skipped += 1
+            elif op == "add_star" and movie_id not in people[person_id]["movies"]:
+                people[person_id]["movies"].add(movie_id)
+                movies[movie_id]["stars"].add(person_id)
+                edges += 1
+            elif op == "remove_star" and movie_id in people[person_id]["movies"]:
+                people[person_id]["movies"].discard(movie_id)
+                movies[movie_id]["stars"].discard(person_id)
+                edges += 1
+
+    return edges, skipped
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = sys.argv[1:]
+    compact = "--compact" in args
+    if compact:
+        args.remove("--compact")
+    if len(args) > 1:
+        sys.exit("Usage: python degrees.py [--compact] [directory]")
+    directory = args[0] if len(args) == 1 else "large"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, compact)
     print("Data loaded.")
+    if skipped_stars:
+        print(f"Skipped {skipped_stars} star rows with an unknown person or movie.")
 
-    source = person_id_for_name(input("Name: "))
-    if source is None:
-        sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
-    if target is None:
-        sys.exit("Person not found.")
+    source = ask_for_person()
+    target = ask_for_person()
 
     path = shortest_path(source, target)
 
@@ -78,20 +219,32 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = get_person(path[i][1])["name"]
+            person2 = get_person(path[i + 1][1])["name"]
+            movie = get_movie(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=True):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
-    
+
+    By default the search grows frontiers from both ends, see
+    `bidirectional_shortest_path`. Pass bidirectional=False for the
+    plain single-frontier breadth-first search.
     """
+    if landmarks is not None:
+        return guided_path(graph, landmarks, source, target)
+
+    if graph is not None:
+        return graph.shortest_path(source, target)
+
+    if bidirectional:
+        return bidirectional_shortest_path(source, target)
+
     # Keeps track of the number of nodes explored
     num_explored = 0
 
@@ -134,6 +287,163 @@ def shortest_path(source, target):
         
 
 
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching breadth-first
+    from both people at once.
+
+    Each step expands one whole layer of the smaller frontier. When
+    that layer touches people already reached from the other side,
+    the shortest of those meetings is kept, so the result is as short
+    as a one-sided breadth-first search would find.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie_id, person_id) step that
+    # led to them from their own side of the search
+    source_parents = {source: None}
+    target_parents = {target: None}
+
+    source_frontier = [source]
+    target_frontier = [target]
+
+    while source_frontier and target_frontier:
+
+        # Always grow the smaller side, that is what keeps the search small
+        if len(source_frontier) <= len(target_frontier):
+            source_frontier, meeting = expand_layer(
+                source_frontier, source_parents, target_parents)
+        else:
+            target_frontier, meeting = expand_layer(
+                target_frontier, target_parents, source_parents)
+
+        if meeting is not None:
+            return join_paths(meeting, source_parents, target_parents)
+
+    return None
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, one at a time.
+    """
+    searched = compact_graph()
+    for path in ShortestPaths(searched, *person_ints(searched, source, target)):
+        yield ids_for_path(searched, path)
+
+
+def count_shortest_paths(source, target):
+    """
+    Returns the number of shortest paths between the source and the
+    target, without listing them.
+    """
+    searched = compact_graph()
+    return ShortestPaths(searched, *person_ints(searched, source, target)).count()
+
+
+def k_shortest_paths(source, target, k, slack=SLACK):
+    """
+    Returns up to `k` lists of (movie_id, person_id) pairs that connect
+    the source to the target without repeating a person, shortest
+    first, none more than `slack` steps longer than a shortest one.
+    """
+    searched = compact_graph()
+    found = paths.k_shortest_paths(searched, *person_ints(searched, source, target), k, slack)
+    return [ids_for_path(searched, path) for path in found]
+
+
+def compact_graph():
+    """
+    Returns the loaded CompactGraph, converting the dicts the first time
+    if the data was not loaded compact.
+    """
+    global dict_graph
+    if graph is not None:
+        return graph
+    if dict_graph is None:
+        dict_graph = CompactGraph.from_dicts(people, movies)
+    return dict_graph
+
+
+def person_ints(searched, *person_ids):
+    return [searched.person_index[person_id] for person_id in person_ids]
+
+
+def ids_for_path(searched, path):
+    return [(searched.movie_ids[movie], searched.person_ids[person]) for movie, person in path]
+
+
+def expand_layer(frontier, parents, other_parents):
+    """
+    Expands every person in `frontier` by one step, recording parents.
+
+    Returns the next layer together with the person where this side
+    met the other side on the shortest combined path, or None if the
+    two sides have not met yet.
+    """
+    next_frontier = []
+    meeting = None
+    best = None
+
+    for person_id in frontier:
+        for movie_id, neighbour in neighbors_for_person(person_id):
+            if neighbour in parents:
+                continue
+            parents[neighbour] = (movie_id, person_id)
+            next_frontier.append(neighbour)
+
+            if neighbour in other_parents:
+                # Every meeting in this layer has the same length on this
+                # side, so compare on the length of the other side only
+                length = path_length(neighbour, other_parents)
+                if best is None or length < best:
+                    best = length
+                    meeting = neighbour
+
+    return next_frontier, meeting
+
+
+def path_length(person_id, parents):
+    """
+    Returns the number of steps from `person_id` back to the root of `parents`.
+    """
+    length = 0
+    while parents[person_id] is not None:
+        person_id = parents[person_id][1]
+        length += 1
+    return length
+
+
+def join_paths(meeting, source_parents, target_parents):
+    """
+    Builds the (movie_id, person_id) path from the source to the target
+    through the person where both searches met.
+    """
+    path = []
+
+    # Backtracking from the meeting point to the source
+    person_id = meeting
+    while source_parents[person_id] is not None:
+        movie_id, previous = source_parents[person_id]
+        path.append((movie_id, person_id))
+        person_id = previous
+    path.reverse()
+
+    # Walking forward from the meeting point to the target
+    person_id = meeting
+    while target_parents[person_id] is not None:
+        movie_id, following = target_parents[person_id]
+        path.append((movie_id, following))
+        person_id = following
+
+    return path
+
+
 def check(node, target):
 
     if node.state == target:
@@ -156,18 +466,47 @@ def check(node, target):
 
 
 
-def person_id_for_name(name):
+def ask_for_person():
+    """
+    Prompts for a name and returns its person_id, exiting with some
+    suggestions if nobody has that name.
+    """
+    name = input("Name: ")
+    person_id = person_id_for_name(name)
+    if person_id is None:
+        suggestions = search_people(name, 5)
+        if suggestions:
+            print("Did you mean:")
+            for suggestion in suggestions:
+                person = get_person(suggestion)
+                print(f"  {person['name']} ({person['birth'] or 'unknown'})")
+        sys.exit("Person not found.")
+    return person_id
+
+
+def person_id_for_name(name, birth=None, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If `birth` is given, only people born that year match. When several
+    people still match, the user is asked which one was meant, or if
+    `interactive` is False, the one in the most movies is picked.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = get_person_ids(name)
+    if birth is not None:
+        person_ids = [
+            person_id for person_id in person_ids
+            if get_person(person_id)["birth"] == str(birth)
+        ]
     if len(person_ids) == 0:
         return None
+    elif len(person_ids) > 1 and not interactive:
+        return max(sorted(person_ids), key=get_movie_count)
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = get_person(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -187,6 +526,9 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -195,5 +537,65 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def get_person_ids(name):
+    """
+    Returns the person_ids for a name, whichever way the data was loaded.
+    """
+    if graph is not None:
+        return graph.person_ids_for_name(name)
+    return list(names.get(name.lower(), set()))
+
+
+def search_people(query, limit=10):
+    """
+    Returns up to `limit` person_ids for a name or part of one: exact
+    matches, then names starting with `query`, then names a couple of
+    typos away, people in more movies first.
+    """
+    global name_index
+
+    if graph is not None:
+        return [graph.person_ids[person] for person in graph.name_index.search(query, limit)]
+
+    if name_index is None:
+        person_ids = list(people)
+        name_index = (
+            NameIndex(
+                [people[person_id]["name"] for person_id in person_ids],
+                weight=lambda i: len(people[person_ids[i]]["movies"])
+            ),
+            person_ids
+        )
+    index, person_ids = name_index
+    return [person_ids[i] for i in index.search(query, limit)]
+
+
+def get_movie_count(person_id):
+    """
+    Returns the number of movies a person starred in.
+    """
+    if graph is not None:
+        return graph.movie_count(graph.person_index[person_id])
+    return len(people[person_id]["movies"])
+
+
+def get_person(person_id):
+    """
+    Returns a dictionary with the name and birth of a person.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def get_movie(movie_id):
+    """
+    Returns a dictionary with the title and year of a movie.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,601 @@
+"""
+Compact, integer-indexed graph of people and movies for degrees
+"""
+import csv
+from array import array
+from bisect import bisect_left
+from operator import itemgetter
+
+from names import NameIndex
+
+
+class CompactGraph():
+    """
+    People and movies interned to dense ints, with person -> movie and
+    movie -> person edges stored in compressed sparse row (CSR) arrays.
+
+    The movies of person p are
+        person_movies[person_offsets[p]:person_offsets[p + 1]]
+    and the stars of movie m are
+        movie_stars[movie_offsets[m]:movie_offsets[m + 1]]
+
+    Any int sequence works for the arrays and any str sequence for the
+    tables, so a snapshot can hand in memory-mapped buffers directly.
+    The optional orders list person or movie ints sorted by ID, and
+    person ints sorted by lowercase name, so lookups can bisect them
+    instead of building dicts.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_order=None, movie_order=None, name_order=None):
+
+        # ID and detail tables, indexed by the dense int of a person or movie
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+
+        # Adjacency in both directions
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # Sorted orders for the lookups below, computed when missing
+        self._person_order = person_order
+        self._movie_order = movie_order
+        self._name_order = name_order
+
+        # Reverse lookups, built the first time they are needed
+        self._person_index = None
+        self._movie_index = None
+        self._name_index = None
+
+        # Star rows that referred to an unknown person or movie when built
+        self.skipped_stars = 0
+
+        # Delta updates applied since the graph was built from the CSVs
+        self.generation = 0
+
+    @classmethod
+    def from_dicts(cls, people, movies):
+        """
+        Builds a graph from the `people` and `movies` dicts of degrees.py.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        person_offsets = array("i", [0])
+        person_movies = array("i")
+        for person_id in person_ids:
+            person_movies.extend(sorted(
+                movie_index[movie_id] for movie_id in people[person_id]["movies"]
+            ))
+            person_offsets.append(len(person_movies))
+
+        movie_offsets = array("i", [0])
+        movie_stars = array("i")
+        for movie_id in movie_ids:
+            movie_stars.extend(sorted(
+                person_index[person_id] for person_id in movies[movie_id]["stars"]
+            ))
+            movie_offsets.append(len(movie_stars))
+
+        graph = cls(
+            person_ids,
+            [people[person_id]["name"] for person_id in person_ids],
+            [people[person_id]["birth"] for person_id in person_ids],
+            movie_ids,
+            [movies[movie_id]["title"] for movie_id in movie_ids],
+            [movies[movie_id]["year"] for movie_id in movie_ids],
+            person_offsets, person_movies, movie_offsets, movie_stars
+        )
+        graph._person_index = person_index
+        graph._movie_index = movie_index
+        return graph
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Builds a graph straight from the CSV files in `directory`.
+
+        Rows are read as plain tuples and edges are collected into two
+        int arrays before being sorted into the CSR arrays, so no per-row
+        dicts or per-person sets are ever held. Star rows that refer to an
+        unknown person or movie are skipped and counted in `skipped_stars`.
+        """
+        person_ids = []
+        person_names = []
+        person_births = []
+        person_index = {}
+        for person_id, name, birth in read_rows(
+                f"{directory}/people.csv", ("id", "name", "birth")):
+            if person_id in person_index:
+                continue
+            person_index[person_id] = len(person_ids)
+            person_ids.append(person_id)
+            person_names.append(name)
+            person_births.append(birth)
+
+        movie_ids = []
+        movie_titles = []
+        movie_years = []
+        movie_index = {}
+        for movie_id, title, year in read_rows(
+                f"{directory}/movies.csv", ("id", "title", "year")):
+            if movie_id in movie_index:
+                continue
+            movie_index[movie_id] = len(movie_ids)
+            movie_ids.append(movie_id)
+            movie_titles.append(title)
+            movie_years.append(year)
+
+        edge_people = array("i")
+        edge_movies = array("i")
+        skipped = 0
+        for person_id, movie_id in read_rows(
+                f"{directory}/stars.csv", ("person_id", "movie_id")):
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is None or movie is None:
+                skipped += 1
+                continue
+            edge_people.append(person)
+            edge_movies.append(movie)
+
+        person_offsets, person_movies = group_edges(len(person_ids), edge_people, edge_movies)
+        del edge_people, edge_movies
+
+        # Invert the deduplicated person -> movie arrays into movie -> person
+        movie_people = array("i")
+        for person in range(len(person_ids)):
+            movie_people.extend([person] * (person_offsets[person + 1] - person_offsets[person]))
+        movie_offsets, movie_stars = group_edges(len(movie_ids), person_movies, movie_people)
+        del movie_people
+
+        graph = cls(
+            person_ids, person_names, person_births,
+            movie_ids, movie_titles, movie_years,
+            person_offsets, person_movies, movie_offsets, movie_stars
+        )
+        graph._person_index = person_index
+        graph._movie_index = movie_index
+        graph.skipped_stars = skipped
+        return graph
+
+    @property
+    def num_people(self):
+        return len(self.person_offsets) - 1
+
+    @property
+    def num_movies(self):
+        return len(self.movie_offsets) - 1
+
+    @property
+    def person_order(self):
+        """
+        Person ints sorted by person_id.
+        """
+        if self._person_order is None:
+            self._person_order = array("i", sorted(
+                range(len(self.person_ids)), key=self.person_ids.__getitem__
+            ))
+        return self._person_order
+
+    @property
+    def movie_order(self):
+        """
+        Movie ints sorted by movie_id.
+        """
+        if self._movie_order is None:
+            self._movie_order = array("i", sorted(
+                range(len(self.movie_ids)), key=self.movie_ids.__getitem__
+            ))
+        return self._movie_order
+
+    @property
+    def name_order(self):
+        """
+        Person ints sorted by lowercase name.
+        """
+        if self._name_order is None:
+            names = self.person_names
+            self._name_order = array("i", sorted(
+                range(len(names)), key=lambda i: names[i].lower()
+            ))
+        return self._name_order
+
+    @property
+    def person_index(self):
+        """
+        Maps person_ids to their dense int.
+        """
+        if self._person_index is None:
+            self._person_index = SortedIndex(self.person_ids, self.person_order)
+        return self._person_index
+
+    @property
+    def movie_index(self):
+        """
+        Maps movie_ids to their dense int.
+        """
+        if self._movie_index is None:
+            self._movie_index = SortedIndex(self.movie_ids, self.movie_order)
+        return self._movie_index
+
+    def movies_of(self, person):
+        """
+        Returns the movie ints a person int starred in.
+        """
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person ints who starred in a movie int.
+        """
+        return self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) int pairs for people who starred with a
+        given person int.
+        """
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                yield movie, star
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        movie_ids = self.movie_ids
+        person_ids = self.person_ids
+        return {
+            (movie_ids[movie], person_ids[star])
+            for movie, star in self.neighbors(self.person_index[person_id])
+        }
+
+    @property
+    def name_index(self):
+        """
+        NameIndex over the person names, ranking people by number of movies.
+        """
+        if self._name_index is None:
+            self._name_index = NameIndex(
+                self.person_names, self.name_order, self.movie_count
+            )
+        return self._name_index
+
+    def movie_count(self, person):
+        return self.person_offsets[person + 1] - self.person_offsets[person]
+
+    def person_ids_for_name(self, name):
+        """
+        Returns the person_ids whose name matches `name`, ignoring case.
+        """
+        return [self.person_ids[person] for person in self.name_index.exact(name)]
+
+    def person(self, person_id):
+        """
+        Returns the name and birth of a person.
+        """
+        i = self.person_index[person_id]
+        return {"name": self.person_names[i], "birth": self.person_births[i]}
+
+    def movie(self, movie_id):
+        """
+        Returns the title and year of a movie.
+        """
+        i = self.movie_index[movie_id]
+        return {"title": self.movie_titles[i], "year": self.movie_years[i]}
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        If no possible path, returns None.
+        """
+        path = self.shortest_int_path(
+            self.person_index[source], self.person_index[target]
+        )
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person]) for movie, person in path]
+
+    def shortest_int_path(self, source, target, prune=(None, None)):
+        """
+        Bidirectional breadth-first search between two person ints.
+
+        `prune` may hold a (depth, function) pair for the source side
+        and one for the target side. From that depth on, the function is
+        called with each new person int and its depth on that side. It
+        returns True if the person cannot be on a shortest path, and the
+        search then leaves that person out.
+
+        Returns a list of (movie, person) int pairs, or None if the
+        two people are not connected.
+        """
+        if source == target:
+            return []
+
+        # Maps each reached person to the (movie, person) step that led to it
+        source_parents = {source: None}
+        target_parents = {target: None}
+
+        # Maps each reached person to its distance from its own side
+        source_depth = {source: 0}
+        target_depth = {target: 0}
+
+        # A movie expanded once has added all of its stars already
+        source_movies = set()
+        target_movies = set()
+
+        source_frontier = [source]
+        target_frontier = [target]
+
+        while source_frontier and target_frontier:
+            if len(source_frontier) <= len(target_frontier):
+                source_frontier, meeting = self._expand_layer(
+                    source_frontier, source_parents, source_depth,
+                    source_movies, target_depth, prune[0])
+            else:
+                target_frontier, meeting = self._expand_layer(
+                    target_frontier, target_parents, target_depth,
+                    target_movies, source_depth, prune[1])
+
+            if meeting is not None:
+                return join_int_paths(meeting, source_parents, target_parents)
+
+        return None
+
+    def bfs_tree(self, source, targets=()):
+        """
+        Breadth-first search from a person int.
+
+        Returns a dictionary mapping every reached person int to the
+        (movie, person) step that led to it, or None for the source.
+        If `targets` is not empty, the search stops as soon as all of
+        them have been reached.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        parents = {source: None}
+        remaining = set(targets)
+        remaining.discard(source)
+        stop_early = bool(remaining)
+        seen_movies = set()
+
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for person in frontier:
+                for k in range(person_offsets[person], person_offsets[person + 1]):
+                    movie = person_movies[k]
+                    if movie in seen_movies:
+                        continue
+                    seen_movies.add(movie)
+                    for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                        star = movie_stars[n]
+                        if star in parents:
+                            continue
+                        parents[star] = (movie, person)
+                        next_frontier.append(star)
+
+                        if stop_early and star in remaining:
+                            remaining.remove(star)
+                            if not remaining:
+                                return parents
+            frontier = next_frontier
+
+        return parents
+
+    def distances(self, sources):
+        """
+        Breadth-first search from one or more person ints at once.
+
+        Returns an array with the distance of every person int from the
+        nearest source, or -1 for people that cannot be reached.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        distance = array("i", [-1]) * self.num_people
+        seen_movies = bytearray(self.num_movies)
+
+        frontier = list(sources)
+        for person in frontier:
+            distance[person] = 0
+
+        layer = 0
+        while frontier:
+            layer += 1
+            next_frontier = []
+            for person in frontier:
+                for k in range(person_offsets[person], person_offsets[person + 1]):
+                    movie = person_movies[k]
+                    if seen_movies[movie]:
+                        continue
+                    seen_movies[movie] = 1
+                    for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                        star = movie_stars[n]
+                        if distance[star] == -1:
+                            distance[star] = layer
+                            next_frontier.append(star)
+            frontier = next_frontier
+
+        return distance
+
+    def _expand_layer(self, frontier, parents, depth, seen_movies, other_depth, prune=None):
+        """
+        Expands one whole layer of a bidirectional search.
+
+        Returns the next layer and the meeting person on the shortest
+        combined path, or None if the two sides have not met.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        next_frontier = []
+        meeting = None
+        best = None
+
+        # Every person in a frontier has the same depth
+        layer = depth[frontier[0]] + 1
+        if prune is not None:
+            first_depth, prune = prune
+            if layer < first_depth:
+                prune = None
+
+        for person in frontier:
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if movie in seen_movies:
+                    continue
+                seen_movies.add(movie)
+                for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_stars[n]
+                    if star in parents:
+                        continue
+                    if prune is not None and prune(star, layer):
+                        continue
+                    parents[star] = (movie, person)
+                    depth[star] = layer
+                    next_frontier.append(star)
+
+                    if star in other_depth and (best is None or other_depth[star] < best):
+                        best = other_depth[star]
+                        meeting = star
+
+        return next_frontier, meeting
+
+
+def read_rows(path, columns):
+    """
+    Yields a tuple of the named `columns` for each row of a CSV file.
+
+    Blank rows are skipped and a file without a header row has no rows,
+    as with csv.DictReader.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        pick = itemgetter(*[header.index(column) for column in columns])
+        for row in reader:
+            if not row:
+                continue
+            yield pick(row)
+
+
+def group_edges(count, sources, targets):
+    """
+    Sorts (source, target) edges into CSR offsets and targets for
+    `count` sources, with each source's targets sorted and deduplicated.
+    """
+    # Counting sort on the source
+    offsets = array("i", [0]) * (count + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+
+    grouped = array("i", [0]) * len(targets)
+    position = array("i", offsets)
+    for source, target in zip(sources, targets):
+        grouped[position[source]] = target
+        position[source] += 1
+    del position
+
+    # Sort each source's targets and drop repeated rows
+    compact_offsets = array("i", [0]) * (count + 1)
+    compact = array("i")
+    for source in range(count):
+        compact.extend(sorted(set(grouped[offsets[source]:offsets[source + 1]])))
+        compact_offsets[source + 1] = len(compact)
+    return compact_offsets, compact
+
+
+class SortedIndex():
+    """
+    Read-only mapping from the values of a table to their positions,
+    answered by bisecting `order`, the positions sorted by value.
+    """
+
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+
+    def __getitem__(self, value):
+        table = self.table
+        order = self.order
+        k = bisect_left(order, value, key=table.__getitem__)
+        if k == len(order) or table[order[k]] != value:
+            raise KeyError(value)
+        return order[k]
+
+    def __contains__(self, value):
+        try:
+            self[value]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.order)
+
+
+def tree_path(parents, target):
+    """
+    Returns the (movie, person) int path from the root of a `bfs_tree`
+    to `target`, or None if the search did not reach `target`.
+    """
+    if target not in parents:
+        return None
+
+    path = []
+    person = target
+    while parents[person] is not None:
+        movie, previous = parents[person]
+        path.append((movie, person))
+        person = previous
+    path.reverse()
+    return path
+
+
+def join_int_paths(meeting, source_parents, target_parents):
+    """
+    Builds the (movie, person) int path from the source to the target
+    through the person where both searches met.
+    """
+    path = []
+
+    person = meeting
+    while source_parents[person] is not None:
+        movie, previous = source_parents[person]
+        path.append((movie, person))
+        person = previous
+    path.reverse()
+
+    person = meeting
+    while target_parents[person] is not None:
+        movie, following = target_parents[person]
+        path.append((movie, following))
+        person = following
+
+    return path
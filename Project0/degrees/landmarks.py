@@ -0,0 +1,391 @@
+"""
+Landmark (ALT) index over the compact degrees graph.
+
+Usage: python landmarks.py directory [count]
+
+Builds breadth-first distances from the best connected people, and saves
+them next to the data snapshot. With the index loaded, the distance
+between two people is bounded without searching, and shortest paths are
+found with a search those bounds prune.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from snapshot import read_header, snapshot_path
+
+# File written next to the snapshot
+INDEX_NAME = "degrees.landmarks"
+
+# Bump whenever the layout below changes, older indexes get ignored
+VERSION = 1
+
+MAGIC = b"DEGLMRK\0"
+
+# Magic, version and length of the JSON header that follows
+PREAMBLE = struct.Struct("<8sII")
+
+# Number of landmarks built by default
+LANDMARKS = 128
+
+# Number of landmarks consulted by the lower bound during one search
+ACTIVE = 4
+
+# Largest gap between the bounds for which a search is pruned
+SLACK = 1
+
+
+class LandmarkIndex():
+    """
+    Breadth-first distances from a few landmark people to everyone.
+
+    The distance from landmarks[i] to person p is distances[i * num_people + p],
+    or `unreachable` if they are not connected. eccentricities[i] is the
+    largest distance from landmarks[i] to anyone it reaches.
+    """
+
+    def __init__(self, landmarks, distances, eccentricities, num_people, unreachable):
+        self.landmarks = landmarks
+        self.distances = distances
+        self.eccentricities = eccentricities
+        self.num_people = num_people
+        self.unreachable = unreachable
+
+    @classmethod
+    def build(cls, graph, count=LANDMARKS):
+        """
+        Builds an index over `graph` with up to `count` landmarks.
+
+        Half of the landmarks are the people with the most movies,
+        skipping anyone who starred with an earlier landmark. They sit on
+        many shortest paths and give tight upper bounds. The other half
+        are picked one at a time as the person farthest from every
+        landmark so far. They sit at the edge of the graph and give
+        tight lower bounds.
+        """
+        n = graph.num_people
+        person_offsets = graph.person_offsets
+
+        landmarks = array("i")
+        rows = []
+
+        # Distance from each person to the nearest landmark so far
+        nearest = array("i", [-1]) * n
+
+        def add(person):
+            row = graph.distances([person])
+            landmarks.append(person)
+            rows.append(row)
+            for p in range(n):
+                if row[p] != -1 and (nearest[p] == -1 or row[p] < nearest[p]):
+                    nearest[p] = row[p]
+
+        hubs = sorted(range(n), key=lambda p: person_offsets[p] - person_offsets[p + 1])
+        for person in hubs:
+            if len(landmarks) >= (count + 1) // 2:
+                break
+            if person_offsets[person] == person_offsets[person + 1]:
+                break
+            if nearest[person] in (0, 1):
+                continue
+            add(person)
+
+        while landmarks and len(landmarks) < count:
+            person = max(range(n), key=nearest.__getitem__)
+            if nearest[person] <= 1:
+                break
+            add(person)
+
+        # One byte per distance unless the graph is unusually long
+        farthest = max((max(row) for row in rows), default=0)
+        typecode, unreachable = ("B", 0xFF) if farthest < 0xFF else ("H", 0xFFFF)
+
+        distances = array(typecode)
+        for row in rows:
+            distances.extend(unreachable if d == -1 else d for d in row)
+        eccentricities = [max(row) for row in rows]
+
+        return cls(landmarks, distances, eccentricities, n, unreachable)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the distance between two person ints.
+
+        The lower bound is math.inf if a landmark reaches only one of them.
+        The upper bound is math.inf if no landmark reaches both.
+        """
+        if source == target:
+            return 0, 0
+
+        distances = self.distances
+        n = self.num_people
+        unreachable = self.unreachable
+
+        lower = 0
+        upper = math.inf
+        for base in range(0, len(distances), n):
+            ds = distances[base + source]
+            dt = distances[base + target]
+            if ds == unreachable or dt == unreachable:
+                if ds != dt:
+                    return math.inf, math.inf
+                continue
+            lower = max(lower, abs(ds - dt))
+            upper = min(upper, ds + dt)
+        return lower, upper
+
+    def active_rows(self, target, count=ACTIVE):
+        """
+        Returns (base, distance to target, eccentricity) for the `count`
+        landmarks farthest from `target`, which tend to give the best bounds.
+        """
+        distances = self.distances
+        n = self.num_people
+        unreachable = self.unreachable
+
+        rows = []
+        for i, base in enumerate(range(0, len(distances), n)):
+            dt = distances[base + target]
+            if dt != unreachable:
+                rows.append((dt, base, self.eccentricities[i]))
+        rows.sort(reverse=True)
+        return [(base, dt, eccentricity) for dt, base, eccentricity in rows[:count]]
+
+    def estimator(self, target):
+        """
+        Returns a function giving a lower bound on the distance from a
+        person int to `target`, or math.inf if they are not connected,
+        and the largest finite value that function can return.
+        """
+        distances = self.distances
+        unreachable = self.unreachable
+        active = self.active_rows(target)
+        rows = [(base, dt) for base, dt, _ in active]
+        largest = max(
+            (max(dt, eccentricity - dt) for _, dt, eccentricity in active), default=0
+        )
+
+        def estimate(person):
+            best = 0
+            for base, dt in rows:
+                dp = distances[base + person]
+                if dp == unreachable:
+                    # The landmark reaches the target but not this person
+                    return math.inf
+                if dp - dt > best:
+                    best = dp - dt
+                elif dt - dp > best:
+                    best = dt - dp
+            return best
+
+        return estimate, largest
+
+
+def guided_path(graph, index, source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using the landmark index.
+
+    If no possible path, returns None.
+    """
+    path = guided_int_path(graph, index, graph.person_index[source], graph.person_index[target])
+    if path is None:
+        return None
+    return [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+
+
+def guided_int_path(graph, index, source, target):
+    """
+    Shortest path between two person ints, guided by the landmarks.
+
+    When the landmark bounds agree, the path through the landmark that
+    gives the upper bound is already a shortest one. Otherwise both sides
+    of a bidirectional search drop every person whose depth plus lower
+    bound to the other end exceeds the upper bound, the A* test, since
+    such a person cannot lie on a shortest path. The test only runs when
+    the bounds are close, and at depths where the lower bound could be
+    large enough to fail it.
+
+    Returns a list of (movie, person) int pairs, or None.
+    """
+    if source == target:
+        return []
+
+    lower, upper = index.bounds(source, target)
+    if lower == math.inf:
+        return None
+    if lower == upper:
+        return landmark_path(graph, index, source, target)
+    if upper - lower > SLACK:
+        # Loose bounds rarely prune enough to pay for computing them
+        return graph.shortest_int_path(source, target)
+
+    to_target, most_to_target = index.estimator(target)
+    to_source, most_to_source = index.estimator(source)
+    return graph.shortest_int_path(source, target, prune=(
+        (upper - most_to_target + 1, lambda person, depth: depth + to_target(person) > upper),
+        (upper - most_to_source + 1, lambda person, depth: depth + to_source(person) > upper)
+    ))
+
+
+def landmark_path(graph, index, source, target):
+    """
+    Returns the path from `source` to `target` through the landmark with
+    the smallest sum of distances to both, stepping to a person one closer
+    to the landmark at every move.
+    """
+    distances = index.distances
+    n = index.num_people
+    unreachable = index.unreachable
+
+    best = None
+    for base in range(0, len(distances), n):
+        ds = distances[base + source]
+        dt = distances[base + target]
+        if ds != unreachable and dt != unreachable:
+            if best is None or ds + dt < best[0]:
+                best = (ds + dt, base)
+    base = best[1]
+
+    def descend(person):
+        """
+        Returns the (movie, person) steps from `person` to the landmark.
+        """
+        steps = []
+        while distances[base + person] > 0:
+            closer = distances[base + person] - 1
+            steps.append(next(
+                (movie, star) for movie, star in graph.neighbors(person)
+                if distances[base + star] == closer
+            ))
+            person = steps[-1][1]
+        return steps
+
+    path = descend(source)
+
+    # Walk the target's steps backwards, from the landmark to the target
+    person = target
+    back = []
+    for movie, star in descend(target):
+        back.append((movie, person))
+        person = star
+    back.reverse()
+
+    return path + back
+
+
+def distance(graph, index, source, target):
+    """
+    Returns the number of degrees between two person ints, or None if
+    they are not connected. Only searches when the bounds disagree.
+    """
+    lower, upper = index.bounds(source, target)
+    if lower == math.inf:
+        return None
+    if lower == upper:
+        return lower
+    path = guided_int_path(graph, index, source, target)
+    return None if path is None else len(path)
+
+
+def index_path(directory):
+    return os.path.join(directory, INDEX_NAME)
+
+
+def snapshot_identity(directory):
+    """
+    Returns the source CSV hashes and update generation of the snapshot
+    the index belongs to, so an index is dropped when the graph in the
+    snapshot changes but not when the same graph is written again.
+    """
+    with open(snapshot_path(directory), "rb") as f:
+        header = read_header(f)
+    if header is None:
+        return None
+    return {"hashes": header["hashes"], "generation": header.get("generation", 0)}
+
+
+def save_index(index, directory):
+    """
+    Writes `index` next to the snapshot in `directory`.
+    """
+    landmarks = array("i", index.landmarks).tobytes()
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "snapshot": snapshot_identity(directory),
+        "people": index.num_people,
+        "unreachable": index.unreachable,
+        "landmarks": len(index.landmarks),
+        "eccentricities": list(index.eccentricities)
+    }).encode("utf-8")
+    header += b" " * (-(PREAMBLE.size + len(header)) % 8)
+
+    path = index_path(directory)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(landmarks)
+        f.write(b"\0" * (-len(landmarks) % 8))
+        f.write(bytes(index.distances))
+    os.replace(temporary, path)
+
+
+def load_index(directory, graph):
+    """
+    Memory-maps the landmark index in `directory` and returns it.
+
+    Returns None if there is no index, or if it was built for another
+    version or another snapshot.
+    """
+    try:
+        f = open(index_path(directory), "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        magic, version, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC or version != VERSION:
+            return None
+        header = json.loads(f.read(length))
+        try:
+            identity = snapshot_identity(directory)
+        except FileNotFoundError:
+            return None
+        if (identity is None or header["byteorder"] != sys.byteorder
+                or header["snapshot"] != identity or header["people"] != graph.num_people):
+            return None
+        buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    start = PREAMBLE.size + length
+    size = header["landmarks"] * 4
+    landmarks = buffer[start:start + size].cast("i")
+    start += size + (-size % 8)
+    distances = buffer[start:].cast("B" if header["unreachable"] == 0xFF else "H")
+    return LandmarkIndex(
+        landmarks, distances, header["eccentricities"], graph.num_people, header["unreachable"]
+    )
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python landmarks.py directory [count]")
+    directory = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else LANDMARKS
+
+    # Imported here so that degrees can import this module
+    import degrees
+
+    degrees.load_data(directory, compact=True)
+    print("Building landmarks...")
+    index = LandmarkIndex.build(degrees.graph, count)
+    save_index(index, directory)
+    print(f"Saved {len(index.landmarks)} landmarks to {index_path(directory)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Sorted name index with exact, prefix and fuzzy lookups for degrees
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+
+# Largest edit distance a fuzzy lookup accepts by default
+MAX_DISTANCE = 2
+
+# Number of candidates a search returns by default
+LIMIT = 10
+
+
+class NameIndex():
+    """
+    Names sorted case-insensitively, searched by bisection.
+
+    Lookups return positions in `names`, ranked where it matters by
+    `weight(position)`, for example how many movies a person starred in.
+    The sorted order can be handed in, so a snapshot does not have to
+    sort the names again. The lowercase names and their weights are
+    read once, on the first lookup, so lookups never decode a name.
+    """
+
+    def __init__(self, names, order=None, weight=None):
+        self.names = names
+        if order is None:
+            order = array("i", sorted(range(len(names)), key=lambda i: names[i].lower()))
+        self.order = order
+        self.weight = weight if weight is not None else (lambda position: 0)
+
+        # Lowercase names in sorted order, and a tree over their weights
+        self._keys = None
+        self._heaviest = None
+        self._reversed = None
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            names = self.names
+            self._keys = [names[position].lower() for position in self.order]
+        return self._keys
+
+    @property
+    def heaviest(self):
+        """
+        Segment tree over the sorted order: entry j >= n is place j - n,
+        and entry j < n is whichever of entries 2j and 2j + 1 ranks first,
+        heaviest and then alphabetically first.
+        """
+        if self._heaviest is None:
+            n = len(self.order)
+            weight = self.weight
+            self.weights = array("q", (weight(position) for position in self.order))
+            tree = array("i", [0] * n) + array("i", range(n))
+            for j in range(n - 1, 0, -1):
+                tree[j] = self.better(tree[2 * j], tree[2 * j + 1])
+            self._heaviest = tree
+        return self._heaviest
+
+    def better(self, k, other):
+        """
+        Returns whichever of two places in the sorted order ranks first.
+        """
+        weights = self.weights
+        if weights[other] > weights[k] or (weights[other] == weights[k] and other < k):
+            return other
+        return k
+
+    def key(self, position):
+        return self.names[position].lower()
+
+    def bisect(self, query, lo=0, hi=None):
+        """
+        Returns the first place in the sorted order not below `query`.
+        """
+        if hi is None:
+            hi = len(self.order)
+        return bisect_left(self.keys, query, lo, hi)
+
+    def exact(self, query):
+        """
+        Returns the positions of every name equal to `query`, ignoring case.
+        """
+        query = query.lower()
+        keys = self.keys
+        positions = []
+        k = self.bisect(query)
+        while k < len(keys) and keys[k] == query:
+            positions.append(self.order[k])
+            k += 1
+        return positions
+
+    def top(self, lo, hi):
+        """
+        Returns the place in [lo, hi) of the sorted order that ranks first.
+        """
+        tree = self.heaviest
+        n = len(self.order)
+        best = lo
+        lo += n
+        hi += n
+        while lo < hi:
+            if lo & 1:
+                best = self.better(best, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self.better(best, tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def prefix(self, query, limit=LIMIT):
+        """
+        Returns up to `limit` positions of names starting with `query`,
+        the heaviest first.
+
+        The names with the prefix are a range of the sorted order. The
+        heaviest name of a range splits it in two, so the next heaviest
+        is the heaviest of one of the ranges left.
+        """
+        query = query.lower()
+        if not query:
+            return []
+        lo = self.bisect(query)
+        hi = self.bisect(query[:-1] + chr(ord(query[-1]) + 1), lo)
+        if lo == hi:
+            return []
+
+        k = self.top(lo, hi)
+        weights = self.weights
+        ranges = [(-weights[k], k, lo, hi)]
+        found = []
+        while ranges and len(found) < limit:
+            _, k, lo, hi = heapq.heappop(ranges)
+            found.append(self.order[k])
+            for start, end in ((lo, k), (k + 1, hi)):
+                if start < end:
+                    best = self.top(start, end)
+                    heapq.heappush(ranges, (-weights[best], best, start, end))
+        return found
+
+    @property
+    def reversed(self):
+        """
+        The lowercase names spelled backwards, sorted, with their positions.
+        """
+        if self._reversed is None:
+            keys = self.keys
+            places = sorted(range(len(keys)), key=lambda k: keys[k][::-1])
+            self._reversed = (
+                [keys[k][::-1] for k in places],
+                array("i", (self.order[k] for k in places))
+            )
+        return self._reversed
+
+    def fuzzy(self, query, max_distance=MAX_DISTANCE, limit=LIMIT):
+        """
+        Returns up to `limit` (distance, position) pairs for names within
+        `max_distance` edits of `query`, the closest and heaviest first.
+
+        If a name is within d edits, then either the first half of `query`
+        is within d // 2 edits of the start of the name, or the rest is
+        within d - d // 2 - 1 edits of its end. So the names are walked
+        twice with that tighter bound over the first half of the walk:
+        forwards, then spelled backwards from the end.
+        """
+        query = query.lower()
+        if max_distance == 0:
+            return [(0, position) for position in self.exact(query)][:limit]
+
+        half = len(query) // 2
+        ahead = max_distance // 2
+        behind = max_distance - ahead - 1
+        found = self.walk(self.keys, self.order, query, max_distance, half, ahead)
+        found.update(self.walk(
+            *self.reversed, query[::-1], max_distance, len(query) - half, behind
+        ))
+
+        matches = sorted(
+            ((distance, position) for position, distance in found.items()),
+            key=lambda match: (match[0], -self.weight(match[1]), self.key(match[1]))
+        )
+        return matches[:limit]
+
+    @staticmethod
+    def walk(keys, order, query, max_distance, start, start_distance):
+        """
+        Returns the distance of every name in the sorted `keys` within
+        `max_distance` edits of `query` whose first `start` letters are
+        within `start_distance` of the start of the name, by position.
+
+        The sorted keys are walked as a trie, carrying one row of the
+        edit distance table per prefix, so only prefixes that can still
+        end within the distance are ever visited.
+        """
+        # Distances past max_distance are all the same to the walk, and
+        # a prefix t letters long is at least |t - i| edits from the first
+        # i letters of the query, so only a band of each row is computed
+        n = len(query)
+        cap = max_distance + 1
+        found = {}
+        stack = [("", 0, len(keys), [min(i, cap) for i in range(n + 1)])]
+        while stack:
+            prefix, lo, hi, row = stack.pop()
+            depth = len(prefix)
+
+            # Names equal to the prefix sort before its longer names
+            k = lo
+            while k < hi and len(keys[k]) == depth:
+                if row[-1] <= max_distance:
+                    found[order[k]] = row[-1]
+                k += 1
+
+            # Until the name is as long as the start of the query could
+            # be with its edits, the start must stay within its distance
+            strict = depth + 1 <= start - start_distance
+
+            while k < hi:
+                letter = keys[k][depth]
+                end = bisect_left(keys, prefix + chr(ord(letter) + 1), k, hi)
+
+                next_row = [cap] * (n + 1)
+                next_row[0] = min(depth + 1, cap)
+                for i in range(max(1, depth + 1 - max_distance), min(n, depth + 1 + max_distance) + 1):
+                    cost = row[i - 1] + (query[i - 1] != letter)
+                    if row[i] + 1 < cost:
+                        cost = row[i] + 1
+                    if next_row[i - 1] + 1 < cost:
+                        cost = next_row[i - 1] + 1
+                    next_row[i] = cost if cost < cap else cap
+                if strict:
+                    keep = min(next_row[:start + 1]) <= start_distance
+                else:
+                    keep = min(next_row) <= max_distance
+                if keep:
+                    stack.append((prefix + letter, k, end, next_row))
+                k = end
+        return found
+
+    def search(self, query, limit=LIMIT, max_distance=MAX_DISTANCE):
+        """
+        Returns up to `limit` ranked positions for `query`: exact matches,
+        then names starting with it, then names within `max_distance` edits.
+        """
+        results = self.rank(self.exact(query))
+        for position in self.prefix(query, limit):
+            if len(results) == limit:
+                return results
+            if position not in results:
+                results.append(position)
+        if len(results) >= limit:
+            # Enough without walking for typos
+            return results[:limit]
+        for _, position in self.fuzzy(query, max_distance, limit):
+            if len(results) == limit:
+                return results
+            if position not in results:
+                results.append(position)
+        return results
+
+    def rank(self, positions):
+        """
+        Returns `positions` sorted heaviest first, then by name.
+        """
+        return sorted(positions, key=self.rank_key)
+
+    def rank_key(self, position):
+        return -self.weight(position), self.key(position)
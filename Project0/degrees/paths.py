@@ -0,0 +1,186 @@
+"""
+All shortest paths and near-shortest paths between two people in degrees
+"""
+
+# How many steps longer than a shortest path near-shortest paths may be
+SLACK = 2
+
+
+class ShortestPaths():
+    """
+    Every shortest path between two person ints, from one breadth-first
+    search. The search records the depth of each person it reaches. The
+    parents of a person are then the people one layer closer to the
+    source who share a movie with it. Paths are enumerated lazily from
+    those parents, and counted without enumerating them.
+
+    A path is a list of (movie, person) int pairs. Two people who share
+    several movies make several different paths.
+    """
+
+    def __init__(self, graph, source, target):
+        self.graph = graph
+        self.source = source
+        self.target = target
+        self.depth = layers(graph, source, target)
+        self.length = self.depth.get(target)
+        self._parents = {}
+
+    def parents(self, person):
+        """
+        Returns the (movie, parent) pairs that lead to `person` on a
+        shortest path from the source.
+        """
+        if person not in self._parents:
+            depth = self.depth
+            layer = depth[person] - 1
+            self._parents[person] = [
+                (movie, star)
+                for movie in self.graph.movies_of(person)
+                for star in self.graph.stars_of(movie)
+                if depth.get(star) == layer
+            ]
+        return self._parents[person]
+
+    def count(self):
+        """
+        Returns the number of shortest paths, without enumerating them.
+        """
+        if self.length is None:
+            return 0
+
+        # People on some shortest path, layer by layer back from the target
+        on_path = [[self.target]]
+        seen = {self.target}
+        for _ in range(self.length):
+            layer = []
+            for person in on_path[-1]:
+                for _, parent in self.parents(person):
+                    if parent not in seen:
+                        seen.add(parent)
+                        layer.append(parent)
+            on_path.append(layer)
+
+        # Paths from the source to each of them, layer by layer forward
+        counts = {self.source: 1}
+        for layer in reversed(on_path[:-1]):
+            for person in layer:
+                counts[person] = sum(counts[parent] for _, parent in self.parents(person))
+        return counts[self.target]
+
+    def __iter__(self):
+        """
+        Yields every shortest path, one at a time.
+        """
+        if self.length is None:
+            return
+        yield from self._paths_to(self.target)
+
+    def _paths_to(self, person):
+        if person == self.source:
+            yield []
+            return
+        for movie, parent in self.parents(person):
+            for path in self._paths_to(parent):
+                path.append((movie, person))
+                yield path
+
+
+def layers(graph, source, target):
+    """
+    Breadth-first search from `source` that stops once `target` is reached.
+
+    Returns a dictionary with the depth of every person reached. All
+    people closer to the source than the target are in it.
+    """
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+    movie_stars = graph.movie_stars
+
+    depth = {source: 0}
+    seen_movies = set()
+    frontier = [source]
+    layer = 0
+    while frontier and target not in depth:
+        layer += 1
+        next_frontier = []
+        for person in frontier:
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if movie in seen_movies:
+                    continue
+                seen_movies.add(movie)
+                for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_stars[n]
+                    if star not in depth:
+                        depth[star] = layer
+                        next_frontier.append(star)
+        frontier = next_frontier
+    return depth
+
+
+def near_shortest_paths(graph, source, target, slack=SLACK):
+    """
+    Yields simple paths from `source` to `target` in order of length,
+    from the shortest up to `slack` steps longer.
+
+    One breadth-first search from the target gives every person's
+    distance to it. A depth-first search from the source then only
+    follows people whose distance to the target still fits in the
+    length being enumerated.
+    """
+    if source == target:
+        yield []
+        return
+
+    to_target = graph.distances([target])
+    shortest = to_target[source]
+    if shortest == -1:
+        return
+
+    for length in range(shortest, shortest + slack + 1):
+        yield from paths_of_length(graph, source, target, length, to_target)
+
+
+def paths_of_length(graph, source, target, length, to_target):
+    """
+    Yields the simple paths from `source` to `target` with exactly
+    `length` steps.
+    """
+    path = []
+    visited = {source}
+
+    def extend(person):
+        steps = len(path)
+        if person == target:
+            if steps == length:
+                yield list(path)
+            return
+        for movie in graph.movies_of(person):
+            for star in graph.stars_of(movie):
+                if star in visited:
+                    continue
+                distance = to_target[star]
+                if distance == -1 or steps + 1 + distance > length:
+                    continue
+                visited.add(star)
+                path.append((movie, star))
+                yield from extend(star)
+                path.pop()
+                visited.remove(star)
+
+    yield from extend(source)
+
+
+def k_shortest_paths(graph, source, target, k, slack=SLACK):
+    """
+    Returns up to `k` simple paths from `source` to `target`, shortest
+    first, none more than `slack` steps longer than a shortest path.
+    """
+    paths = []
+    for path in near_shortest_paths(graph, source, target, slack):
+        paths.append(path)
+        if len(paths) == k:
+            break
+    return paths
@@ -0,0 +1,278 @@
+"""
+Binary snapshot of a CompactGraph, memory-mapped on reload
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph import CompactGraph
+
+# File written next to the CSVs
+SNAPSHOT_NAME = "degrees.snapshot"
+
+# Small file next to the snapshot with the times of CSVs touched since
+STATS_NAME = "degrees.snapshot.stats"
+
+# Bump whenever the layout below changes, older snapshots get rebuilt
+VERSION = 1
+
+MAGIC = b"DEGSNAP\0"
+
+# Magic, version and length of the JSON header that follows
+PREAMBLE = struct.Struct("<8sII")
+
+# CSV files the snapshot is built from
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Int arrays stored in the snapshot
+ARRAYS = (
+    "person_offsets", "person_movies", "movie_offsets", "movie_stars",
+    "person_order", "movie_order", "name_order"
+)
+
+# String tables stored in the snapshot
+TABLES = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years"
+)
+
+
+class StringTable():
+    """
+    Read-only sequence of strings packed into one UTF-8 buffer,
+    decoded one item at a time.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, SNAPSHOT_NAME)
+
+
+def stats_path(directory):
+    return os.path.join(directory, STATS_NAME)
+
+
+def source_stats(directory):
+    """
+    Returns the size and modification time of each source CSV.
+    """
+    stats = {}
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        stats[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return stats
+
+
+def source_hashes(directory):
+    """
+    Returns the SHA-1 of each source CSV.
+    """
+    hashes = {}
+    for name in SOURCES:
+        digest = hashlib.sha1()
+        with open(os.path.join(directory, name), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        hashes[name] = digest.hexdigest()
+    return hashes
+
+
+def pack_strings(strings):
+    """
+    Returns the offsets array and UTF-8 buffer for a sequence of strings.
+    """
+    offsets = array("i", [0])
+    data = bytearray()
+    for string in strings:
+        data += string.encode("utf-8")
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+def save_snapshot(graph, directory):
+    """
+    Writes `graph` to a snapshot next to the CSV files in `directory`.
+
+    The file is written under a temporary name and moved into place,
+    so a reader never sees half a snapshot.
+    """
+    sections = {}
+    for name in ARRAYS:
+        sections[name] = array("i", getattr(graph, name)).tobytes()
+    for name in TABLES:
+        offsets, data = pack_strings(getattr(graph, name))
+        sections[f"{name}.offsets"] = offsets.tobytes()
+        sections[f"{name}.data"] = data
+
+    # Lay the sections out one after another, aligned to 8 bytes
+    layout = {}
+    position = 0
+    for name, data in sections.items():
+        layout[name] = [position, len(data)]
+        position += len(data) + (-len(data) % 8)
+
+    header = pack_header({
+        "byteorder": sys.byteorder,
+        "stats": source_stats(directory),
+        "hashes": source_hashes(directory),
+        "skipped_stars": graph.skipped_stars,
+        "generation": graph.generation,
+        "sections": layout
+    })
+
+    path = snapshot_path(directory)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for data in sections.values():
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+    os.replace(temporary, path)
+
+
+def pack_header(header):
+    """
+    Returns the JSON header, padded so the sections after it start aligned.
+    """
+    data = json.dumps(header).encode("utf-8")
+    return data + b" " * (-(PREAMBLE.size + len(data)) % 8)
+
+
+def read_stats(directory):
+    """
+    Returns the hashes and times recorded by `save_stats`, or None.
+    """
+    try:
+        with open(stats_path(directory), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_stats(hashes, stats, directory):
+    """
+    Records that the CSVs with `hashes` now have `stats`, without
+    touching the snapshot, so the landmark index saved with it stays.
+    """
+    path = stats_path(directory)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump({"hashes": hashes, "stats": stats}, f)
+    os.replace(temporary, path)
+
+
+def read_header(f):
+    """
+    Returns the JSON header of an open snapshot, or None if the file is
+    not a snapshot this version can read.
+    """
+    preamble = f.read(PREAMBLE.size)
+    if len(preamble) != PREAMBLE.size:
+        return None
+    magic, version, length = PREAMBLE.unpack(preamble)
+    if magic != MAGIC or version != VERSION:
+        return None
+    header = json.loads(f.read(length))
+    if header["byteorder"] != sys.byteorder:
+        return None
+    header["start"] = PREAMBLE.size + length
+    return header
+
+
+def is_current(header, directory):
+    """
+    Checks whether a snapshot header still matches the source CSVs.
+
+    Matching sizes and modification times are trusted, whether those in
+    the header or those recorded since for the same hashes. Otherwise
+    the files are hashed, so a touched but unchanged CSV does not force
+    a rebuild, and their new times are recorded so the next check is cheap.
+    """
+    stats = source_stats(directory)
+    if header["stats"] == stats:
+        return True
+    if read_stats(directory) == {"hashes": header["hashes"], "stats": stats}:
+        return True
+    if header["hashes"] != source_hashes(directory):
+        return False
+    try:
+        save_stats(header["hashes"], stats, directory)
+    except OSError:
+        # A read-only data directory only costs later runs the hashing
+        pass
+    return True
+
+
+def load_snapshot(directory):
+    """
+    Memory-maps the snapshot in `directory` and returns its CompactGraph.
+
+    Returns None if there is no snapshot, or if it is from another
+    version or no longer matches the CSV files.
+    """
+    try:
+        f = open(snapshot_path(directory), "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        header = read_header(f)
+        if header is None or not is_current(header, directory):
+            return None
+        buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def section(name):
+        position, length = header["sections"][name]
+        position += header["start"]
+        return buffer[position:position + length]
+
+    arrays = {name: section(name).cast("i") for name in ARRAYS}
+    tables = {
+        name: StringTable(section(f"{name}.offsets").cast("i"), section(f"{name}.data"))
+        for name in TABLES
+    }
+    graph = CompactGraph(**tables, **arrays)
+    graph.skipped_stars = header.get("skipped_stars", 0)
+    graph.generation = header.get("generation", 0)
+    return graph
+
+
+def load_graph(directory, build):
+    """
+    Returns the CompactGraph for `directory`, from its snapshot if that is
+    current, otherwise from `build()`, saving a new snapshot for next time.
+    """
+    graph = load_snapshot(directory)
+    if graph is not None:
+        return graph
+
+    graph = build()
+    try:
+        save_snapshot(graph, directory)
+    except OSError:
+        # A read-only data directory only costs the next run its speed-up
+        pass
+    return graph
@@ -0,0 +1,227 @@
+"""
+Graph-wide separation statistics for the degrees data.
+
+Usage: python stats.py [--json] directory [samples] [sweeps]
+
+Reports connected components, degree distributions, the average
+separation over a sample of breadth-first searches, and bounds on the
+diameter from repeated double sweeps.
+"""
+import json
+import random
+import sys
+from array import array
+from collections import Counter
+
+import degrees
+
+# Breadth-first searches used to sample the average separation
+SAMPLES = 20
+
+# Double sweeps used to bound the diameter
+SWEEPS = 4
+
+
+def main():
+    usage = "Usage: python stats.py [--json] directory [samples] [sweeps]"
+    args = sys.argv[1:]
+    as_json = "--json" in args
+    if as_json:
+        args.remove("--json")
+    if len(args) not in [1, 2, 3]:
+        sys.exit(usage)
+    try:
+        samples = int(args[1]) if len(args) > 1 else SAMPLES
+        sweeps = int(args[2]) if len(args) > 2 else SWEEPS
+    except ValueError:
+        sys.exit(usage)
+
+    degrees.load_data(args[0], compact=True)
+    stats = graph_stats(degrees.graph, samples, sweeps)
+
+    if as_json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print_stats(stats)
+
+
+def graph_stats(graph, samples=SAMPLES, sweeps=SWEEPS, seed=0):
+    """
+    Computes the statistics for `graph` and returns them as a dictionary.
+    """
+    rng = random.Random(seed)
+
+    component, sizes = connected_components(graph)
+    largest = max(range(len(sizes)), key=sizes.__getitem__) if sizes else None
+    members = [p for p in range(graph.num_people) if component[p] == largest]
+
+    stats = {
+        "people": graph.num_people,
+        "movies": graph.num_movies,
+        "stars": len(graph.movie_stars),
+        "components": len(sizes),
+        "largest_component": sizes[largest] if sizes else 0,
+        "people_without_movies": sum(
+            1 for p in range(graph.num_people)
+            if graph.person_offsets[p] == graph.person_offsets[p + 1]
+        ),
+        "component_sizes": histogram(sizes),
+        "movies_per_person": histogram(
+            graph.person_offsets[p + 1] - graph.person_offsets[p]
+            for p in range(graph.num_people)
+        ),
+        "stars_per_movie": histogram(
+            graph.movie_offsets[m + 1] - graph.movie_offsets[m]
+            for m in range(graph.num_movies)
+        ),
+        "costars_per_person": costar_histogram(graph)
+    }
+
+    # Every eccentricity found bounds the diameter of the largest component:
+    # the diameter is at least the largest, and at most twice the smallest
+    eccentricities = {}
+
+    sources = rng.sample(members, min(samples, len(members)))
+    separations = Counter()
+    for source in sources:
+        distance = graph.distances([source])
+        counts = Counter(distance)
+        del counts[-1]
+        del counts[0]
+        separations.update(counts)
+        eccentricities[source] = max(counts, default=0)
+
+    for _ in range(sweeps if members else 0):
+        start = rng.choice(members)
+        for _ in range(2):
+            distance = graph.distances([start])
+            eccentricities[start] = max(distance)
+            start = distance.index(eccentricities[start])
+        eccentricities[start] = max(graph.distances([start]))
+
+    pairs = sum(separations.values())
+    stats["separation"] = {
+        "samples": len(sources),
+        "average": sum(d * c for d, c in separations.items()) / pairs if pairs else None,
+        "histogram": histogram_of(separations)
+    }
+    stats["eccentricity"] = {
+        graph.person_ids[person]: value for person, value in eccentricities.items()
+    }
+    stats["diameter"] = {
+        "lower": max(eccentricities.values(), default=0),
+        "upper": 2 * min(eccentricities.values(), default=0)
+    }
+    return stats
+
+
+def connected_components(graph):
+    """
+    Labels the connected components of the people in `graph`.
+
+    Returns an array with the component of every person int, and a list
+    with the size of every component.
+    """
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+    movie_stars = graph.movie_stars
+
+    component = array("i", [-1]) * graph.num_people
+    seen_movies = bytearray(graph.num_movies)
+    sizes = []
+
+    for start in range(graph.num_people):
+        if component[start] != -1:
+            continue
+        label = len(sizes)
+        component[start] = label
+        size = 1
+        stack = [start]
+        while stack:
+            person = stack.pop()
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if seen_movies[movie]:
+                    continue
+                seen_movies[movie] = 1
+                for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_stars[n]
+                    if component[star] == -1:
+                        component[star] = label
+                        size += 1
+                        stack.append(star)
+        sizes.append(size)
+
+    return component, sizes
+
+
+def costar_histogram(graph):
+    """
+    Returns the histogram of how many different people each person
+    starred with.
+    """
+    counts = Counter()
+    for person in range(graph.num_people):
+        costars = set()
+        for movie in graph.movies_of(person):
+            costars.update(graph.stars_of(movie))
+        costars.discard(person)
+        counts[len(costars)] += 1
+    return histogram_of(counts)
+
+
+def histogram(values):
+    """
+    Returns a {value: count} dictionary sorted by value.
+    """
+    return histogram_of(Counter(values))
+
+
+def histogram_of(counts):
+    return {value: counts[value] for value in sorted(counts)}
+
+
+def print_stats(stats):
+    print(f"People: {stats['people']}")
+    print(f"Movies: {stats['movies']}")
+    print(f"Star credits: {stats['stars']}")
+    print(f"People without movies: {stats['people_without_movies']}")
+    print(f"Connected components: {stats['components']}")
+    print(f"Largest component: {stats['largest_component']} people")
+
+    for key, label in [
+        ("movies_per_person", "Movies per person"),
+        ("stars_per_movie", "Stars per movie"),
+        ("costars_per_person", "Co-stars per person")
+    ]:
+        print(f"{label}:")
+        print_buckets(stats[key])
+
+    separation = stats["separation"]
+    print(f"Separation over {separation['samples']} sampled people:")
+    if separation["average"] is not None:
+        print(f"  average: {separation['average']:.3f} degrees")
+    for distance, count in separation["histogram"].items():
+        print(f"  {distance} degrees: {count}")
+
+    diameter = stats["diameter"]
+    print(f"Diameter of the largest component: between {diameter['lower']} and {diameter['upper']}")
+
+
+def print_buckets(counts):
+    """
+    Prints a histogram in power-of-two buckets, so long tails stay short.
+    """
+    buckets = Counter()
+    for value, count in counts.items():
+        low = 0 if value == 0 else 1 << (value.bit_length() - 1)
+        buckets[low] += count
+    for low in sorted(buckets):
+        high = max(low, 2 * low - 1)
+        span = f"{low}" if high == low else f"{low}-{high}"
+        print(f"  {span}: {buckets[low]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+Incremental updates to the degrees data from delta files.
+
+Usage: python updates.py directory delta.jsonl [delta.jsonl ...]
+
+A delta file holds one JSON change per line:
+    {"op": "add_person", "id": "102", "name": "Kevin Bacon", "birth": "1958"}
+    {"op": "remove_person", "id": "102"}
+    {"op": "add_movie", "id": "104257", "title": "A Few Good Men", "year": "1992"}
+    {"op": "remove_movie", "id": "104257"}
+    {"op": "add_star", "person_id": "102", "movie_id": "104257"}
+    {"op": "remove_star", "person_id": "102", "movie_id": "104257"}
+
+Adding a person or movie that already exists updates its details.
+Removed people and movies keep their int, with no edges, but can no
+longer be looked up, so landmark distances stay aligned.
+"""
+import json
+import sys
+from array import array
+from bisect import insort
+
+from graph import CompactGraph
+
+OPS = ("add_person", "remove_person", "add_movie", "remove_movie", "add_star", "remove_star")
+
+
+def read_delta(f):
+    """
+    Returns the changes in an open delta file, checking every op.
+    """
+    changes = []
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        change = json.loads(line)
+        if change.get("op") not in OPS:
+            raise ValueError(f"line {number}: unknown op {change.get('op')!r}")
+        changes.append(change)
+    return changes
+
+
+class Delta():
+    """
+    Changes to a CompactGraph, gathered per person and per movie
+    before the graph is rebuilt once.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+        # New rows appended to the tables, and new details for existing rows
+        self.new_people = []
+        self.new_movies = []
+        self.person_details = {}
+        self.movie_details = {}
+
+        # Ints of new people and movies, by ID
+        self.person_index = {}
+        self.movie_index = {}
+
+        self.removed_people = set()
+        self.removed_movies = set()
+
+        # Edges added and removed, seen from both ends
+        self.added = {}
+        self.removed = {}
+        self.added_stars = {}
+        self.removed_stars = {}
+
+        self.skipped = 0
+
+    def person(self, person_id):
+        graph = self.graph
+        if person_id in self.person_index:
+            return self.person_index[person_id]
+        if person_id in graph.person_index:
+            person = graph.person_index[person_id]
+            if person not in self.removed_people:
+                return person
+        return None
+
+    def movie(self, movie_id):
+        graph = self.graph
+        if movie_id in self.movie_index:
+            return self.movie_index[movie_id]
+        if movie_id in graph.movie_index:
+            movie = graph.movie_index[movie_id]
+            if movie not in self.removed_movies:
+                return movie
+        return None
+
+    def apply(self, change):
+        op = change["op"]
+        graph = self.graph
+
+        if op == "add_person":
+            person = self.person(change["id"])
+            details = (change.get("name", ""), change.get("birth", ""))
+            if person is None:
+                person = graph.num_people + len(self.new_people)
+                self.person_index[change["id"]] = person
+                self.new_people.append((change["id"],) + details)
+            else:
+                self.person_details[person] = details
+
+        elif op == "add_movie":
+            movie = self.movie(change["id"])
+            details = (change.get("title", ""), change.get("year", ""))
+            if movie is None:
+                movie = graph.num_movies + len(self.new_movies)
+                self.movie_index[change["id"]] = movie
+                self.new_movies.append((change["id"],) + details)
+            else:
+                self.movie_details[movie] = details
+
+        elif op == "remove_person":
+            person = self.person(change["id"])
+            if person is not None:
+                for movie in list(self.movies_of(person)):
+                    self.edge(person, movie, False)
+                self.removed_people.add(person)
+                self.person_index.pop(change["id"], None)
+
+        elif op == "remove_movie":
+            movie = self.movie(change["id"])
+            if movie is not None:
+                for person in list(self.stars_of(movie)):
+                    self.edge(person, movie, False)
+                self.removed_movies.add(movie)
+                self.movie_index.pop(change["id"], None)
+
+        else:
+            person = self.person(change["person_id"])
+            movie = self.movie(change["movie_id"])
+            if person is None or movie is None:
+                self.skipped += 1
+            else:
+                self.edge(person, movie, op == "add_star")
+
+    def movies_of(self, person):
+        movies = set()
+        if person < self.graph.num_people:
+            movies.update(self.graph.movies_of(person))
+        movies -= self.removed.get(person, set())
+        movies |= self.added.get(person, set())
+        return movies
+
+    def stars_of(self, movie):
+        stars = set()
+        if movie < self.graph.num_movies:
+            stars.update(self.graph.stars_of(movie))
+        stars -= self.removed_stars.get(movie, set())
+        stars |= self.added_stars.get(movie, set())
+        return stars
+
+    def edge(self, person, movie, add):
+        """
+        Records that the edge between `person` and `movie` was added or removed.
+        """
+        present = movie in self.movies_of(person)
+        if present == add:
+            return
+        on, off = (self.added, self.removed) if add else (self.removed, self.added)
+        stars_on, stars_off = (
+            (self.added_stars, self.removed_stars) if add else (self.removed_stars, self.added_stars)
+        )
+        if movie in off.get(person, ()):
+            off[person].discard(movie)
+            stars_off[movie].discard(person)
+        else:
+            on.setdefault(person, set()).add(movie)
+            stars_on.setdefault(movie, set()).add(person)
+
+    def build(self):
+        """
+        Returns a new CompactGraph with every change applied.
+        """
+        graph = self.graph
+        num_people = graph.num_people + len(self.new_people)
+        num_movies = graph.num_movies + len(self.new_movies)
+
+        person_ids = list(graph.person_ids) + [row[0] for row in self.new_people]
+        person_names = list(graph.person_names) + [row[1] for row in self.new_people]
+        person_births = list(graph.person_births) + [row[2] for row in self.new_people]
+        for person, (name, birth) in self.person_details.items():
+            person_names[person] = name
+            person_births[person] = birth
+
+        movie_ids = list(graph.movie_ids) + [row[0] for row in self.new_movies]
+        movie_titles = list(graph.movie_titles) + [row[1] for row in self.new_movies]
+        movie_years = list(graph.movie_years) + [row[2] for row in self.new_movies]
+        for movie, (title, year) in self.movie_details.items():
+            movie_titles[movie] = title
+            movie_years[movie] = year
+
+        person_offsets, person_movies = rebuild_edges(
+            graph.person_offsets, graph.person_movies, num_people, self.added, self.removed
+        )
+        movie_offsets, movie_stars = rebuild_edges(
+            graph.movie_offsets, graph.movie_stars, num_movies, self.added_stars, self.removed_stars
+        )
+
+        # Removed and renamed people leave the lookup orders, new and
+        # renamed people are put back in their sorted place
+        renamed = set(self.person_details)
+        gone = self.removed_people
+        added_people = range(graph.num_people, num_people)
+
+        person_order = [p for p in graph.person_order if p not in gone]
+        for person in added_people:
+            if person not in gone:
+                insort(person_order, person, key=person_ids.__getitem__)
+
+        name_order = [p for p in graph.name_order if p not in gone and p not in renamed]
+        for person in sorted(renamed.union(added_people) - gone):
+            insort(name_order, person, key=lambda p: person_names[p].lower())
+
+        movie_order = [m for m in graph.movie_order if m not in self.removed_movies]
+        for movie in range(graph.num_movies, num_movies):
+            if movie not in self.removed_movies:
+                insort(movie_order, movie, key=movie_ids.__getitem__)
+
+        updated = CompactGraph(
+            person_ids, person_names, person_births,
+            movie_ids, movie_titles, movie_years,
+            person_offsets, person_movies, movie_offsets, movie_stars,
+            array("i", person_order), array("i", movie_order), array("i", name_order)
+        )
+        updated.skipped_stars = graph.skipped_stars + self.skipped
+        updated.generation = graph.generation + 1
+        return updated
+
+
+def rebuild_edges(offsets, targets, count, added, removed):
+    """
+    Returns new CSR offsets and targets for `count` rows, copying the
+    rows nobody touched and merging the added and removed edges into
+    the others.
+    """
+    old_count = len(offsets) - 1
+    new_offsets = array("i", [0])
+    new_targets = array("i")
+    for row in range(count):
+        if row < old_count:
+            old = targets[offsets[row]:offsets[row + 1]]
+        else:
+            old = ()
+        if row in added or row in removed:
+            merged = set(old)
+            merged -= removed.get(row, set())
+            merged |= added.get(row, set())
+            new_targets.extend(sorted(merged))
+        else:
+            new_targets.extend(old)
+        new_offsets.append(len(new_targets))
+    return new_offsets, new_targets
+
+
+def apply_delta(graph, changes):
+    """
+    Applies a list of changes to `graph`.
+
+    Returns the updated graph, the (person, movie, added) edges that
+    changed, which tell caches what to invalidate, the ints of the people
+    removed and the number of star changes skipped for an unknown person
+    or movie.
+    """
+    delta = Delta(graph)
+    for change in changes:
+        delta.apply(change)
+
+    edges = []
+    for changed, added in [(delta.added, True), (delta.removed, False)]:
+        for person in sorted(changed):
+            edges.extend((person, movie, added) for movie in sorted(changed[person]))
+    return delta.build(), edges, delta.removed_people, delta.skipped
+
+
+def stale_landmarks(index, graph, edges, removed=()):
+    """
+    Returns the positions of the landmarks whose distances the edge
+    changes made wrong in the updated `graph`, where the people in
+    `removed` are gone and no longer need a distance.
+
+    The old distances are still right if every person in a movie is
+    within one step of its co-stars, and every person still has a
+    co-star one step closer to the landmark. Added edges can only break
+    the first, removed edges only the second, so only the people at
+    either end of a changed edge are checked.
+    """
+    old_people = index.num_people
+    unreachable = index.unreachable
+    distances = index.distances
+
+    stale = []
+    for i, base in enumerate(range(0, len(distances), old_people)):
+
+        def distance(person):
+            return distances[base + person] if person < old_people else unreachable
+
+        def has_parent(person):
+            closer = distance(person) - 1
+            return closer < 0 or any(
+                distance(star) == closer for _, star in graph.neighbors(person)
+            )
+
+        for person, movie, added in edges:
+            dp = distance(person)
+            if added:
+                broken = any(
+                    (dp == unreachable) != (distance(star) == unreachable)
+                    or abs(dp - distance(star)) > 1
+                    for star in graph.stars_of(movie)
+                )
+            elif dp == unreachable:
+                broken = False
+            else:
+                # The person and their co-stars one step farther away may
+                # have lost the co-star that led them to the landmark, but
+                # a removed person has no distance left to keep right
+                broken = (person not in removed and not has_parent(person)) or any(
+                    distance(star) == dp + 1 and not has_parent(star)
+                    for star in graph.stars_of(movie)
+                )
+            if broken:
+                stale.append(i)
+                break
+    return stale
+
+
+def update_landmarks(index, graph, edges, removed=()):
+    """
+    Returns a landmark index for the updated `graph`, with the distances
+    of stale landmarks searched again and the others kept, and how many
+    landmarks were searched again. The people in `removed` are made
+    unreachable in the rows kept.
+    """
+    from landmarks import LandmarkIndex
+
+    old_people = index.num_people
+    unreachable = index.unreachable
+    stale = stale_landmarks(index, graph, edges, removed)
+
+    n = graph.num_people
+    distances = array("B" if unreachable == 0xFF else "H")
+    eccentricities = list(index.eccentricities)
+    for i, base in enumerate(range(0, len(index.distances), old_people)):
+        if i in stale:
+            row = graph.distances([index.landmarks[i]])
+            eccentricities[i] = max(row)
+            if eccentricities[i] >= unreachable:
+                # The distances no longer fit, start the index over
+                return LandmarkIndex.build(graph, len(index.landmarks)), len(index.landmarks)
+            distances.extend(unreachable if d == -1 else d for d in row)
+        else:
+            distances.extend(index.distances[base:base + old_people])
+            distances.extend([unreachable] * (n - old_people))
+            for person in removed:
+                if person < old_people:
+                    distances[i * n + person] = unreachable
+
+    updated = LandmarkIndex(
+        array("i", index.landmarks), distances, eccentricities, n, unreachable
+    )
+    return updated, len(stale)
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit("Usage: python updates.py directory delta.jsonl [delta.jsonl ...]")
+    directory = sys.argv[1]
+
+    import degrees
+
+    degrees.load_data(directory, compact=True)
+    for path in sys.argv[2:]:
+        with open(path, encoding="utf-8") as f:
+            report = degrees.apply_updates(read_delta(f), directory)
+        print(f"{path}: {report['edges']} edge changes, "
+              f"{report['skipped']} skipped, "
+              f"{report['landmarks']} landmarks searched again.")
+
+
+if __name__ == "__main__":
+    main()
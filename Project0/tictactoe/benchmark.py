@@ -0,0 +1,120 @@
+"""
+Compares the tictactoe search modes.
+
+Usage: python benchmark.py [--table]
+       python benchmark.py --parallel [workers ...]
+
+For a few positions, reports how many boards minimax searches and how
+long it takes, with and without alpha-beta pruning. The opening book is
+never used, and the transposition table is off unless --table is given,
+so the counts show the search itself. The table is cleared before every
+search.
+
+With --parallel, times the mnk search of a 6x6 four-in-a-row position
+on one process and with the root split over 4, 8 and 16 workers, or
+the worker counts given, and reports the speedups.
+"""
+import math
+import os
+import sys
+import time
+
+import mnk
+import tictactoe as ttt
+from parallel import parallel_search
+
+X = ttt.X
+O = ttt.O
+EMPTY = ttt.EMPTY
+
+POSITIONS = {
+    "empty": ttt.initial_state(),
+    "center": [[EMPTY, EMPTY, EMPTY],
+               [EMPTY, X, EMPTY],
+               [EMPTY, EMPTY, EMPTY]],
+    "corner": [[X, EMPTY, EMPTY],
+               [EMPTY, EMPTY, EMPTY],
+               [EMPTY, EMPTY, EMPTY]],
+    "midgame": [[X, O, EMPTY],
+                [EMPTY, X, EMPTY],
+                [EMPTY, EMPTY, O]]
+}
+
+MODES = {"minimax": False, "alpha-beta": True}
+
+# The m,n,k-game, moves played and search depth timed with --parallel
+PARALLEL_GAME = (6, 6, 4)
+PARALLEL_MOVES = [(2, 2), (3, 3), (2, 3)]
+PARALLEL_DEPTH = 5
+
+# Worker counts timed with --parallel by default
+PARALLEL_WORKERS = [4, 8, 16]
+
+
+def search(board, alpha_beta):
+    """
+    Returns the action minimax plays, the boards it searched and the
+    seconds it took.
+    """
+    ttt.transpositions.clear()
+    ttt.nodes = 0
+    start = time.perf_counter()
+    action = ttt.minimax(board, alpha_beta)
+    return action, ttt.nodes, time.perf_counter() - start
+
+
+def compare_parallel(worker_counts):
+    """
+    Times the serial and parallel mnk searches and checks they agree.
+    """
+    game = mnk.Game(*PARALLEL_GAME)
+    board = game.initial_state()
+    for action in PARALLEL_MOVES:
+        board = game.result(board, action)
+
+    def timed(search, *args):
+        start = time.perf_counter()
+        found = search(game, board, math.inf, mnk.line_heuristic, PARALLEL_DEPTH, *args)
+        return found, time.perf_counter() - start
+
+    print(f"{os.cpu_count()} CPUs, {PARALLEL_GAME} game, depth {PARALLEL_DEPTH}")
+    print(f"{'workers':>8} {'action':8} {'seconds':>9} {'speedup':>8}")
+    serial, serial_seconds = timed(mnk.search)
+    print(f"{'serial':>8} {str(serial[0]):8} {serial_seconds:9.3f} {1:8.2f}")
+    for workers in worker_counts:
+        found, seconds = timed(parallel_search, workers)
+        print(f"{workers:8} {str(found[0]):8} {seconds:9.3f} {serial_seconds / seconds:8.2f}")
+        if found != serial:
+            sys.exit(f"The parallel search with {workers} workers disagrees.")
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["--parallel"]:
+        if not all(arg.isdigit() for arg in args[1:]):
+            sys.exit("Usage: python benchmark.py --parallel [workers ...]")
+        compare_parallel([int(arg) for arg in args[1:]] or PARALLEL_WORKERS)
+        return
+
+    table = "--table" in args
+    if table:
+        args.remove("--table")
+    if args:
+        sys.exit("Usage: python benchmark.py [--table] | --parallel [workers ...]")
+    if not table:
+        ttt.TABLE_SIZE = 0
+    ttt.book = None
+
+    print(f"{'position':10} {'mode':12} {'action':8} {'nodes':>9} {'seconds':>9}")
+    for name, board in POSITIONS.items():
+        actions = set()
+        for mode, alpha_beta in MODES.items():
+            action, nodes, seconds = search(board, alpha_beta)
+            actions.add(action)
+            print(f"{name:10} {mode:12} {str(action):8} {nodes:9} {seconds:9.3f}")
+        if len(actions) > 1:
+            sys.exit(f"The search modes disagree on the {name} position.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Bitboard Tic Tac Toe engine
+
+A position is a pair of 9-bit integers (x, o), one per player, where
+bit 3 * i + j is set if that player has a mark on cell (i, j).
+"""
+from tictactoe import X, O, EMPTY
+
+# Every cell taken
+FULL = 0b111111111
+
+# The eight lines of three, as masks
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,  # rows
+    0b001001001, 0b010010010, 0b100100100,  # columns
+    0b100010001, 0b001010100                # diagonals
+)
+
+# WINNING[marks] is True if the 9-bit `marks` contain a whole line
+WINNING = tuple(
+    any(marks & mask == mask for mask in WIN_MASKS) for marks in range(FULL + 1)
+)
+
+# MOVES[empty] lists the single-bit moves into the 9-bit `empty`, lowest first
+MOVES = tuple(
+    tuple(1 << cell for cell in range(9) if empty >> cell & 1) for empty in range(FULL + 1)
+)
+
+# CELLS[bit] is the (i, j) action of a single-bit move
+CELLS = {1 << (3 * i + j): (i, j) for i in range(3) for j in range(3)}
+
+
+def from_board(board):
+    """
+    Returns the (x, o) bitboards of a list-of-lists board.
+    """
+    x = o = 0
+    for i in range(3):
+        for j in range(3):
+            if board[i][j] == X:
+                x |= 1 << (3 * i + j)
+            elif board[i][j] == O:
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def to_board(x, o):
+    """
+    Returns the list-of-lists board of (x, o) bitboards.
+    """
+    board = []
+    for i in range(3):
+        row = []
+        for j in range(3):
+            bit = 1 << (3 * i + j)
+            row.append(X if x & bit else O if o & bit else EMPTY)
+        board.append(row)
+    return board
+
+
+def player(x, o):
+    """
+    Returns player who has the next turn.
+    """
+    return O if bin(x).count("1") > bin(o).count("1") else X
+
+
+def actions(x, o):
+    """
+    Returns the single-bit moves available, lowest cell first.
+    """
+    return list(MOVES[FULL ^ (x | o)])
+
+
+def result(x, o, bit):
+    """
+    Returns the (x, o) bitboards after the player to move takes `bit`.
+    """
+    if (x | o) & bit or terminal(x, o):
+        raise ValueError("The action is not valid or the game has ended")
+    if player(x, o) == X:
+        return x | bit, o
+    return x, o | bit
+
+
+def winner(x, o):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    if WINNING[x]:
+        return X
+    if WINNING[o]:
+        return O
+    return None
+
+
+def terminal(x, o):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    return WINNING[x] or WINNING[o] or x | o == FULL
+
+
+def utility(x, o):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    return 1 if WINNING[x] else -1 if WINNING[o] else 0
+
+
+def max_value(x, o):
+    """
+    Value of a position with X to move, O having just moved.
+    """
+    if WINNING[o]:
+        return -1
+    moves = MOVES[FULL ^ (x | o)]
+    if not moves:
+        return 0
+    v = -2
+    for bit in moves:
+        w = min_value(x | bit, o)
+        if w > v:
+            v = w
+    return v
+
+
+def min_value(x, o):
+    """
+    Value of a position with O to move, X having just moved.
+    """
+    if WINNING[x]:
+        return 1
+    moves = MOVES[FULL ^ (x | o)]
+    if not moves:
+        return 0
+    v = 2
+    for bit in moves:
+        w = max_value(x, o | bit)
+        if w < v:
+            v = w
+    return v
+
+
+def value(x, o):
+    """
+    Returns the minimax value of a position, 1 if X wins with best play,
+    -1 if O does, 0 for a draw.
+    """
+    if terminal(x, o):
+        return utility(x, o)
+    return max_value(x, o) if player(x, o) == X else min_value(x, o)
+
+
+def minimax(board):
+    """
+    Returns the optimal action for the current player on a list-of-lists
+    board, or None if the game is over.
+
+    Ties are broken like tictactoe.minimax, by the last of the tied
+    actions in its set of (i, j) actions, so both engines play the same
+    move.
+    """
+    x, o = from_board(board)
+    if terminal(x, o):
+        return None
+
+    turn = player(x, o)
+    best = None
+    for i, j in {CELLS[bit] for bit in actions(x, o)}:
+        bit = 1 << (3 * i + j)
+        if turn == X:
+            v = min_value(x | bit, o)
+            if best is None or v >= best[0]:
+                best = (v, (i, j))
+        else:
+            v = max_value(x, o | bit)
+            if best is None or v <= best[0]:
+                best = (v, (i, j))
+    return best[1]
@@ -0,0 +1,68 @@
+"""
+Solves every reachable tic-tac-toe position and writes the opening book.
+
+Usage: python build_book.py [path]
+
+The book maps each position's base-3 code to the move minimax plays
+there and its value, see tictactoe.load_book. Run this again whenever
+the search changes which of several equally good moves it plays.
+"""
+import os
+import sys
+
+import tictactoe as ttt
+
+
+def reachable(board, seen):
+    """
+    Adds the position code of `board` and of every board reachable
+    from it to `seen`, mapping each to its board.
+    """
+    code = ttt.position_code(board)
+    if code in seen:
+        return
+    seen[code] = board
+    if not ttt.terminal(board):
+        for action in ttt.actions(board):
+            reachable(ttt.result(board, action), seen)
+
+
+def build():
+    """
+    Returns the book bytes, one per position code.
+    """
+    # Search instead of reading the book being replaced
+    ttt.book = None
+
+    positions = {}
+    reachable(ttt.initial_state(), positions)
+
+    data = bytearray([ttt.NO_MOVE]) * 3 ** 9
+    for code, board in positions.items():
+        if ttt.terminal(board):
+            continue
+        i, j = ttt.minimax(board)
+        after = ttt.result(board, (i, j))
+        if ttt.player(board) == ttt.X:
+            value = ttt.MinValue(after)
+        else:
+            value = ttt.MaxValue(after)
+        data[code] = (value + 1) << 4 | (3 * i + j)
+    return bytes(data)
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python build_book.py [path]")
+    path = sys.argv[1] if len(sys.argv) == 2 else ttt.BOOK_PATH
+
+    data = build()
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+    print(f"Saved {len(data) - data.count(ttt.NO_MOVE)} positions to {path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Monte Carlo tree search (UCT) player for m,n,k-games
+
+Usage: python mcts.py [m n k] [seconds]
+
+Plays MCTS as X against the alpha-beta search of mnk as O and prints
+every move. Instead of searching every move, MCTS plays random games
+from the current board and spends more of them on the moves that have
+won most often, so the strength of its play grows with its budget.
+"""
+import math
+import random
+import sys
+import time
+
+from mnk import Game
+import mnk
+from tictactoe import X, O
+
+# Seconds the player may think about one move by default
+BUDGET = 1.0
+
+# Weight of exploring rarely tried moves against exploiting good ones
+EXPLORATION = math.sqrt(2)
+
+# Playouts run between looks at the clock
+CHECK_EVERY = 64
+
+
+class Rules():
+    """
+    An m,n,k-game on bitboards: bit i * n + j of a player's int is set
+    if they have a mark on cell (i, j).
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.cells = game.m * game.n
+        self.full = (1 << self.cells) - 1
+
+        # The k-in-a-row masks through each cell, so a move only needs
+        # checking against the lines it is on
+        self.wins_through = [[] for _ in range(self.cells)]
+        for window in game.windows:
+            mask = 0
+            for i, j in window:
+                mask |= 1 << (i * game.n + j)
+            for i, j in window:
+                self.wins_through[i * game.n + j].append(mask)
+
+    def from_board(self, board):
+        """
+        Returns the (x, o) bitboards of a list-of-lists board.
+        """
+        x = o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    x |= 1 << (i * self.game.n + j)
+                elif cell == O:
+                    o |= 1 << (i * self.game.n + j)
+        return x, o
+
+    def action(self, cell):
+        return divmod(cell, self.game.n)
+
+    def wins(self, marks, cell):
+        """
+        Returns True if `marks` have k in a row through `cell`.
+        """
+        for mask in self.wins_through[cell]:
+            if marks & mask == mask:
+                return True
+        return False
+
+    def empty_cells(self, x, o):
+        taken = x | o
+        return [cell for cell in range(self.cells) if not taken >> cell & 1]
+
+    def playout(self, x, o, turn, rng):
+        """
+        Plays random moves from (x, o), `turn` to move, until the game
+        ends. Returns the winner, or None for a tie.
+        """
+        cells = self.empty_cells(x, o)
+        rng.shuffle(cells)
+        wins_through = self.wins_through
+        for cell in cells:
+            bit = 1 << cell
+            if turn == X:
+                x |= bit
+                marks = x
+            else:
+                o |= bit
+                marks = o
+            for mask in wins_through[cell]:
+                if marks & mask == mask:
+                    return turn
+            turn = O if turn == X else X
+        return None
+
+
+class Node():
+    """
+    A position in the search tree, reached by `cell` from its parent.
+    `wins` counts playouts won by the player who moved into it, half a
+    win for a tie.
+    """
+
+    def __init__(self, x, o, turn, cell=None, parent=None, winner=None, untried=()):
+        self.x = x
+        self.o = o
+        self.turn = turn
+        self.cell = cell
+        self.parent = parent
+        self.winner = winner
+        self.untried = list(untried)
+        self.children = []
+        self.visits = 0
+        self.wins = 0.0
+
+    def terminal(self):
+        return self.winner is not None or (not self.untried and not self.children)
+
+    def select(self, exploration):
+        """
+        Returns the child with the highest upper confidence bound.
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: (
+            child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+        ))
+
+
+class MCTSPlayer():
+    """
+    Chooses moves by Monte Carlo tree search within a budget of seconds,
+    of playouts, or both. The tree is kept between moves, so the
+    playouts spent on the board the opponent actually moved to are not
+    thrown away.
+    """
+
+    def __init__(self, game=None, budget=BUDGET, playouts=None,
+                 exploration=EXPLORATION, seed=None):
+        if budget is None and playouts is None:
+            raise ValueError("MCTSPlayer needs a budget of seconds, of playouts, or both")
+        if budget is not None and budget <= 0:
+            raise ValueError("MCTSPlayer needs a positive budget of seconds")
+        if playouts is not None and playouts < 1:
+            raise ValueError("MCTSPlayer needs at least one playout a move")
+        self.rules = Rules(game if game is not None else Game())
+        self.budget = budget
+        self.playouts = playouts
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.root = None
+
+        # Playouts run for the last move, and how many of them were
+        # already in the tree it reused
+        self.last_playouts = 0
+        self.reused = 0
+
+    def new_node(self, x, o, turn, cell=None, parent=None):
+        rules = self.rules
+        winner = None
+        if cell is not None:
+            mover = O if turn == X else X
+            if rules.wins(x if mover == X else o, cell):
+                winner = mover
+        untried = [] if winner is not None else rules.empty_cells(x, o)
+        self.rng.shuffle(untried)
+        return Node(x, o, turn, cell, parent, winner, untried)
+
+    def find_root(self, x, o, turn):
+        """
+        Returns the node for (x, o) from the last search if it is the
+        old root or up to two moves below it, otherwise a new node.
+        """
+        if self.root is not None:
+            nodes = [self.root]
+            for _ in range(3):
+                for node in nodes:
+                    if node.x == x and node.o == o:
+                        node.parent = None
+                        return node
+                nodes = [child for node in nodes for child in node.children]
+        return self.new_node(x, o, turn)
+
+    def move(self, board):
+        """
+        Returns the (i, j) action to play on a list-of-lists board.
+        """
+        rules = self.rules
+        x, o = rules.from_board(board)
+        turn = self.rules.game.player(board)
+        root = self.find_root(x, o, turn)
+        if root.terminal():
+            raise ValueError("The game has ended")
+        self.root = root
+        self.reused = root.visits
+
+        deadline = time.perf_counter() + self.budget if self.budget is not None else None
+        count = 0
+        while True:
+            if self.playouts is not None and count >= self.playouts:
+                break
+            if deadline is not None and count % CHECK_EVERY == 0 and count:
+                if time.perf_counter() > deadline:
+                    break
+            self.iterate(root)
+            count += 1
+        self.last_playouts = count
+
+        best = max(root.children, key=lambda child: child.visits)
+        return rules.action(best.cell)
+
+    def iterate(self, root):
+        """
+        Runs one selection, expansion, playout and backup from `root`.
+        """
+        node = root
+
+        # Selection: follow the best child while every move has been tried
+        while not node.untried and node.children:
+            node = node.select(self.exploration)
+
+        # Expansion: add one untried move
+        if node.untried and node.winner is None:
+            cell = node.untried.pop()
+            bit = 1 << cell
+            if node.turn == X:
+                x, o = node.x | bit, node.o
+            else:
+                x, o = node.x, node.o | bit
+            child = self.new_node(x, o, O if node.turn == X else X, cell, node)
+            node.children.append(child)
+            node = child
+
+        # Playout from the new node, unless the game is already over there
+        if node.winner is not None or not node.untried:
+            winner = node.winner
+        else:
+            winner = self.rules.playout(node.x, node.o, node.turn, self.rng)
+
+        # Backup: credit every node to the player who moved into it
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner != node.turn:
+                node.wins += 1
+            node = node.parent
+
+
+def main():
+    usage = "Usage: python mcts.py [m n k] [seconds]"
+    args = sys.argv[1:]
+    if len(args) not in [0, 1, 3, 4]:
+        sys.exit(usage)
+    try:
+        m, n, k = (int(arg) for arg in args[:3]) if len(args) >= 3 else (3, 3, 3)
+        budget = float(args[-1]) if len(args) in [1, 4] else BUDGET
+        game = Game(m, n, k)
+        player = MCTSPlayer(game, budget)
+    except ValueError:
+        sys.exit(usage)
+
+    board = game.initial_state()
+    while not game.terminal(board):
+        if game.player(board) == X:
+            action = player.move(board)
+            note = f"{player.last_playouts} playouts, {player.reused} reused"
+        else:
+            action, score, depth = mnk.search(game, board, budget)
+            note = f"depth {depth}"
+        print(f"{game.player(board)} plays {action} ({note})")
+        board = game.result(board, action)
+        for row in board:
+            print(" ".join(cell or "." for cell in row))
+
+    winner = game.winner(board)
+    print(f"Game Over: {winner} wins." if winner else "Game Over: Tie.")
+
+
+if __name__ == "__main__":
+    main()
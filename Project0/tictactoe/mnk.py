@@ -0,0 +1,344 @@
+"""
+m,n,k-games: tic-tac-toe on an m by n board, won with k in a row
+
+Usage: python mnk.py [m n k] [seconds]
+
+Plays the AI against itself and prints every move. Exhaustive minimax
+is out of reach beyond 3x3, so the AI searches to a limited depth with
+alpha-beta, scores the boards it stops at with a heuristic, and keeps
+deepening the search until its time budget runs out.
+"""
+import sys
+import time
+
+from tictactoe import X, O, EMPTY
+
+# Seconds the AI may think about one move by default
+BUDGET = 1.0
+
+# Score of a won board, above anything a heuristic returns
+WIN = 10 ** 9
+
+# Only moves this close to a mark already on the board are searched
+RADIUS = 2
+
+# Boards searched between looks at the clock
+CHECK_EVERY = 1024
+
+# Directions a line can run in, each checked both ways
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# Number of boards searched by every search so far
+nodes = 0
+
+
+class Timeout(Exception):
+    """
+    Raised inside a search once its time budget has run out.
+    """
+
+
+class Game():
+    """
+    Rules of an m,n,k-game on list-of-lists boards of m rows and n
+    columns, with the same functions as tictactoe.
+    """
+
+    def __init__(self, m=3, n=3, k=3):
+        if not 0 < k <= max(m, n):
+            raise ValueError("k must fit on the board")
+        self.m = m
+        self.n = n
+        self.k = k
+
+        # Every run of k cells in a line, for the winner and the heuristic
+        self.windows = []
+        for i in range(m):
+            for j in range(n):
+                for di, dj in DIRECTIONS:
+                    end_i = i + di * (k - 1)
+                    end_j = j + dj * (k - 1)
+                    if 0 <= end_i < m and 0 <= end_j < n:
+                        self.windows.append(
+                            tuple((i + di * step, j + dj * step) for step in range(k))
+                        )
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return [[EMPTY] * self.n for _ in range(self.m)]
+
+    def player(self, board):
+        """
+        Returns player who has the next turn on a board.
+        """
+        x_moves = sum(row.count(X) for row in board)
+        o_moves = sum(row.count(O) for row in board)
+        return O if x_moves > o_moves else X
+
+    def actions(self, board):
+        """
+        Returns set of all possible actions (i, j) available on the board.
+        """
+        return {
+            (i, j) for i in range(self.m) for j in range(self.n) if board[i][j] is EMPTY
+        }
+
+    def result(self, board, action):
+        """
+        Returns the board that results from making move (i, j) on the board.
+        """
+        i, j = action
+        if not (0 <= i < self.m and 0 <= j < self.n) or board[i][j] is not EMPTY:
+            raise ValueError("The action is not valid")
+        if self.terminal(board):
+            raise ValueError("The game has ended")
+        new_board = [row[:] for row in board]
+        new_board[i][j] = self.player(board)
+        return new_board
+
+    def wins_at(self, board, action):
+        """
+        Returns True if the mark on `action` completes k in a row.
+        Only the lines through that cell are looked at.
+        """
+        i, j = action
+        mark = board[i][j]
+        for di, dj in DIRECTIONS:
+            count = 1
+            for sign in (1, -1):
+                y, x = i + sign * di, j + sign * dj
+                while 0 <= y < self.m and 0 <= x < self.n and board[y][x] == mark:
+                    count += 1
+                    y += sign * di
+                    x += sign * dj
+            if count >= self.k:
+                return True
+        return False
+
+    def winner(self, board):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        for window in self.windows:
+            i, j = window[0]
+            mark = board[i][j]
+            if mark is not EMPTY and all(board[y][x] == mark for y, x in window):
+                return mark
+        return None
+
+    def terminal(self, board):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return self.winner(board) is not None or all(EMPTY not in row for row in board)
+
+    def utility(self, board):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        return {X: 1, O: -1, None: 0}[self.winner(board)]
+
+
+def line_heuristic(game, board):
+    """
+    Scores a board for X: every run of k cells that only one player has
+    marks in counts 10 to the number of those marks, for X or against.
+    """
+    score = 0
+    for window in game.windows:
+        x_marks = o_marks = 0
+        for i, j in window:
+            mark = board[i][j]
+            if mark == X:
+                x_marks += 1
+            elif mark == O:
+                o_marks += 1
+        if not o_marks and x_marks:
+            score += 10 ** x_marks
+        elif not x_marks and o_marks:
+            score -= 10 ** o_marks
+    return score
+
+
+class Search():
+    """
+    One depth-limited alpha-beta search, making and undoing moves on its
+    own copy of the board.
+
+    Scores are for the player to move: WIN minus the number of moves to
+    a win, the negated heuristic of the opponent's view, or 0 for a draw.
+    """
+
+    def __init__(self, game, board, heuristic, deadline):
+        self.game = game
+        self.board = [row[:] for row in board]
+        self.heuristic = heuristic
+        self.deadline = deadline
+        self.turn = game.player(board)
+        self.marks = [
+            (i, j) for i in range(game.m) for j in range(game.n) if board[i][j] is not EMPTY
+        ]
+        self.empty = game.m * game.n - len(self.marks)
+        self.nodes = 0
+
+    def candidates(self):
+        """
+        Returns the empty cells within RADIUS of a mark, nearest the
+        center first, or the center of an empty board.
+        """
+        game = self.game
+        board = self.board
+        center = ((game.m - 1) / 2, (game.n - 1) / 2)
+        if not self.marks:
+            return [(game.m // 2, game.n // 2)]
+
+        cells = set()
+        for i, j in self.marks:
+            for y in range(max(0, i - RADIUS), min(game.m, i + RADIUS + 1)):
+                for x in range(max(0, j - RADIUS), min(game.n, j + RADIUS + 1)):
+                    if board[y][x] is EMPTY:
+                        cells.add((y, x))
+        return sorted(cells, key=lambda cell: (
+            (cell[0] - center[0]) ** 2 + (cell[1] - center[1]) ** 2, cell
+        ))
+
+    def play(self, cell):
+        self.board[cell[0]][cell[1]] = self.turn
+        self.marks.append(cell)
+        self.empty -= 1
+        self.turn = O if self.turn == X else X
+
+    def undo(self, cell):
+        self.board[cell[0]][cell[1]] = EMPTY
+        self.marks.pop()
+        self.empty += 1
+        self.turn = O if self.turn == X else X
+
+    def score_move(self, cell, depth, alpha, beta, ply):
+        """
+        Returns the score of playing `cell` for the player to move,
+        searching `depth` moves deep including this one.
+        """
+        mover = self.turn
+        self.play(cell)
+        try:
+            if self.game.wins_at(self.board, cell):
+                return WIN - ply - 1
+            if not self.empty:
+                return 0
+            if depth == 1:
+                score = self.heuristic(self.game, self.board)
+                return score if mover == X else -score
+            return -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+        finally:
+            self.undo(cell)
+
+    def negamax(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0 and time.perf_counter() > self.deadline:
+            raise Timeout
+
+        best = -WIN
+        for cell in self.candidates():
+            score = self.score_move(cell, depth, alpha, beta, ply)
+            if score > best:
+                best = score
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        break
+        return best
+
+    def root(self, depth, order):
+        """
+        Searches the moves in `order` to `depth` and returns the score
+        of each, in the same order.
+        """
+        self.nodes += 1
+        scores = []
+        alpha = -WIN
+        for cell in order:
+            score = self.score_move(cell, depth, alpha, WIN, 0)
+            scores.append(score)
+            alpha = max(alpha, score)
+        return scores
+
+
+def search(game, board, budget=BUDGET, heuristic=line_heuristic, max_depth=None):
+    """
+    Returns (action, score, depth) for the player to move: the best move
+    found, its score and the deepest search that finished in time, or
+    None if the game is over.
+
+    Searches one move deep, then two and so on, each time trying the
+    best move of the last search first, until `budget` seconds are up,
+    `max_depth` is reached or the outcome is certain. A search the clock
+    interrupts is thrown away. Of equally good moves, the one tried
+    first is played.
+    """
+    if game.terminal(board):
+        return None
+    deadline = time.perf_counter() + budget
+    searcher = Search(game, board, heuristic, deadline)
+
+    def search_root(depth, order):
+        scores = searcher.root(depth, order)
+        best = max(scores)
+        return scores.index(best), best
+
+    global nodes
+    try:
+        return deepen(searcher, deadline, max_depth, search_root)
+    finally:
+        nodes += searcher.nodes
+
+
+def deepen(searcher, deadline, max_depth, search_root):
+    """
+    The iterative deepening loop of `search`, for any way of searching
+    the root. `search_root(depth, order)` returns the position in `order`
+    of the best move and its score, or raises Timeout.
+    """
+    order = searcher.candidates()
+    best = (order[0], 0, 0)
+    limit = searcher.empty if max_depth is None else min(max_depth, searcher.empty)
+
+    for depth in range(1, limit + 1):
+        try:
+            position, score = search_root(depth, order)
+        except Timeout:
+            break
+        order = [order[position]] + order[:position] + order[position + 1:]
+        best = (order[0], score, depth)
+        if abs(score) > WIN - limit:
+            # A forced win or loss, deeper searches cannot change it
+            break
+        if time.perf_counter() > deadline:
+            break
+    return best
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) not in [0, 1, 3, 4]:
+        sys.exit("Usage: python mnk.py [m n k] [seconds]")
+    m, n, k = (int(arg) for arg in args[:3]) if len(args) >= 3 else (3, 3, 3)
+    budget = float(args[-1]) if len(args) in [1, 4] else BUDGET
+
+    game = Game(m, n, k)
+    board = game.initial_state()
+    while not game.terminal(board):
+        action, score, depth = search(game, board, budget)
+        print(f"{game.player(board)} plays {action} (depth {depth}, score {score})")
+        board = game.result(board, action)
+        for row in board:
+            print(" ".join(cell or "." for cell in row))
+
+    winner = game.winner(board)
+    print(f"Game Over: {winner} wins." if winner else "Game Over: Tie.")
+
+
+if __name__ == "__main__":
+    main()
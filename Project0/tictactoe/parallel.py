@@ -0,0 +1,106 @@
+"""
+Parallel root-split search for m,n,k-games
+
+The moves at the root of the mnk search are shared out over a pool of
+processes. At every depth the first move, the best of the last depth,
+is searched on its own to get a good alpha bound, then the other moves
+are searched at once. Each worker starts from the best score any move
+has reached so far, shared between the processes.
+"""
+import math
+import multiprocessing
+import time
+
+from mnk import BUDGET, WIN, Search, Timeout, deepen, line_heuristic
+
+# The (game, board, heuristic, shared alpha) a worker process searches,
+# set up by init_worker
+worker = None
+
+
+def context():
+    """
+    Returns the fork context where there is one, so workers inherit the
+    game instead of unpickling it.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def make_pool(workers, game, board, heuristic, alpha):
+    """
+    Returns a pool of `workers` processes searching moves on `board`.
+    """
+    return context().Pool(
+        workers, initializer=init_worker, initargs=(game, board, heuristic, alpha)
+    )
+
+
+def init_worker(*state):
+    global worker
+    worker = state
+
+
+def search_move(task):
+    """
+    Scores one root move inside a worker process.
+
+    Returns the score and the alpha it was searched with, or None if the
+    time ran out. The score is exact if it is above that alpha, and an
+    upper bound otherwise.
+    """
+    cell, depth, deadline = task
+    game, board, heuristic, alpha = worker
+    start = alpha.value
+    try:
+        score = Search(game, board, heuristic, deadline).score_move(cell, depth, start, WIN, 0)
+    except Timeout:
+        return None
+    if score > start:
+        with alpha.get_lock():
+            if score > alpha.value:
+                alpha.value = score
+    return score, start
+
+
+def parallel_search(game, board, budget=BUDGET, heuristic=line_heuristic,
+                    max_depth=None, workers=None):
+    """
+    Returns the same (action, score, depth) as mnk.search, using `workers`
+    processes, by default one per CPU.
+
+    Given the same depths to finish, it plays the same move as mnk.search:
+    the first move in the search order with the best score. A move that
+    only came back as a bound equal to the best score, because another
+    move had already reached it, is searched again to see whether it
+    ties, in case it comes first.
+    """
+    if game.terminal(board):
+        return None
+    deadline = time.perf_counter() + budget
+    searcher = Search(game, board, heuristic, deadline)
+    shared = context().Value("d", -WIN)
+
+    with make_pool(workers, game, board, heuristic, shared) as pool:
+
+        def search_root(depth, order):
+            first = searcher.score_move(order[0], depth, -WIN, WIN, 0)
+            shared.value = first
+            results = pool.map(
+                search_move, [(cell, depth, deadline) for cell in order[1:]], chunksize=1
+            )
+            if None in results:
+                raise Timeout
+            scores = [(first, -WIN)] + results
+
+            best = max(score for score, _ in scores)
+            just_below = math.nextafter(best, -math.inf)
+            for position, (score, start) in enumerate(scores):
+                if score != best:
+                    continue
+                if score > start or searcher.score_move(
+                        order[position], depth, just_below, WIN, 0) >= best:
+                    return position, best
+
+        return deepen(searcher, deadline, max_depth, search_root)
@@ -3,6 +3,18 @@ import sys
 import time
 
 import tictactoe as ttt
+from mcts import BUDGET, MCTSPlayer
+
+# With --mcts [seconds], the AI plays by Monte Carlo tree search within
+# that many seconds a move instead of by minimax
+mcts_player = None
+if "--mcts" in sys.argv:
+    position = sys.argv.index("--mcts")
+    try:
+        budget = float(sys.argv[position + 1]) if len(sys.argv) > position + 1 else BUDGET
+        mcts_player = MCTSPlayer(budget=budget)
+    except ValueError:
+        sys.exit("Usage: python runner.py [--mcts [seconds]]")
 
 pygame.init()
 size = width, height = 600, 400
@@ -112,7 +124,10 @@ while True:
         if user != player and not game_over:
             if ai_turn:
                 time.sleep(0.5)
-                move = ttt.minimax(board)
+                if mcts_player is not None:
+                    move = mcts_player.move(board)
+                else:
+                    move = ttt.minimax(board)
                 board = ttt.result(board, move)
                 ai_turn = False
             else:
@@ -0,0 +1,296 @@
+"""
+Headless self-play benchmark for the tictactoe AIs.
+
+Usage: python selfplay.py [--games N] [--seed S] [--output report.json]
+                          [--baseline baseline.json] [--save-baseline]
+
+Plays seeded games of every AI against a random player, as X and as O
+in turn, on 3x3 and larger boards, without pygame. Reports the win and
+loss rates, the latency of each AI move, the boards or playouts it
+searched and the peak memory of a game, as JSON. The report is compared
+against a stored baseline, and the exit status is 1 if anything
+regressed.
+"""
+import gc
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import mnk
+import tictactoe as ttt
+from mcts import MCTSPlayer
+
+# Games played by every AI by default
+GAMES = 1000
+
+# Games per AI played again under tracemalloc for the peak memory,
+# which slows everything down too much to time the others with it on
+MEMORY_GAMES = 20
+
+# Baseline stored next to this file
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "selfplay_baseline.json")
+
+# How much worse than the baseline a metric may get before it counts
+# as a regression: a factor for costs, a difference for the rates.
+# Latencies below NOISE_MS are too short to compare.
+TOLERANCE = 1.25
+RATE_TOLERANCE = 0.05
+NOISE_MS = 0.05
+
+
+def minimax_ai(game, seed):
+    """
+    tictactoe.minimax as runner.py plays it, opening book and all.
+    """
+    def move(board):
+        before = ttt.nodes
+        action = ttt.minimax(board)
+        return action, ttt.nodes - before
+    return move
+
+
+def search_ai(game, seed):
+    """
+    tictactoe.minimax searching every move, with a table fresh each game.
+    """
+    ttt.transpositions.clear()
+
+    def move(board):
+        book = ttt.book
+        ttt.book = None
+        try:
+            before = ttt.nodes
+            action = ttt.minimax(board)
+            return action, ttt.nodes - before
+        finally:
+            ttt.book = book
+    return move
+
+
+def mnk_ai(depth):
+    """
+    mnk.search to a fixed depth, so its moves do not depend on the clock.
+    """
+    def make(game, seed):
+        def move(board):
+            before = mnk.nodes
+            action = mnk.search(game, board, math.inf, max_depth=depth)[0]
+            return action, mnk.nodes - before
+        return move
+    return make
+
+
+def mcts_ai(playouts):
+    """
+    MCTSPlayer with a fixed number of playouts a move.
+    """
+    def make(game, seed):
+        player = MCTSPlayer(game, budget=None, playouts=playouts, seed=seed)
+
+        def move(board):
+            action = player.move(board)
+            return action, player.last_playouts
+        return move
+    return make
+
+
+# (name, (m, n, k), AI) of everything played
+AIS = [
+    ("minimax", (3, 3, 3), minimax_ai),
+    ("alpha-beta", (3, 3, 3), search_ai),
+    ("mnk depth 4", (4, 4, 3), mnk_ai(4)),
+    ("mnk depth 3", (5, 5, 4), mnk_ai(3)),
+    ("mcts 1000", (3, 3, 3), mcts_ai(1000)),
+    ("mcts 300", (5, 5, 4), mcts_ai(300))
+]
+
+
+def play(game, make_ai, seed):
+    """
+    Plays one game of an AI against a random player, the AI playing X
+    for even seeds and O for odd ones.
+
+    Returns 1 if the AI won, -1 if it lost, 0 for a tie, with the
+    milliseconds and the nodes of each of its moves.
+    """
+    rng = random.Random(seed)
+    ai = make_ai(game, seed)
+    side = ttt.X if seed % 2 == 0 else ttt.O
+
+    board = game.initial_state()
+    latencies = []
+    nodes = []
+    while not game.terminal(board):
+        if game.player(board) == side:
+            start = time.perf_counter()
+            action, searched = ai(board)
+            latencies.append((time.perf_counter() - start) * 1000)
+            nodes.append(searched)
+        else:
+            action = rng.choice(sorted(game.actions(board)))
+        board = game.result(board, action)
+
+    winner = game.winner(board)
+    outcome = 0 if winner is None else 1 if winner == side else -1
+    return outcome, latencies, nodes
+
+
+def percentiles(samples):
+    """
+    Returns the median, 90th and 99th percentiles and maximum of `samples`.
+    """
+    samples = sorted(samples)
+    if not samples:
+        return {"p50": 0, "p90": 0, "p99": 0, "max": 0}
+
+    def at(fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    return {"p50": at(0.5), "p90": at(0.9), "p99": at(0.99), "max": samples[-1]}
+
+
+def benchmark(games, seed):
+    """
+    Returns the report for `games` games of every AI.
+    """
+    report = {
+        "ai": "tictactoe",
+        "games": games,
+        "seed": seed,
+        "python": sys.version.split()[0],
+        "players": {}
+    }
+    for name, (m, n, k), make_ai in AIS:
+        game = mnk.Game(m, n, k)
+        outcomes = {1: 0, 0: 0, -1: 0}
+        latencies = []
+        nodes = []
+        for number in range(games):
+            outcome, game_latencies, game_nodes = play(game, make_ai, seed + number)
+            outcomes[outcome] += 1
+            latencies.extend(game_latencies)
+            nodes.extend(game_nodes)
+
+        peak = 0
+        tracemalloc.start()
+        for number in range(min(games, MEMORY_GAMES)):
+            # Free the last game's search trees before measuring the next
+            gc.collect()
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            play(game, make_ai, seed + number)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+        tracemalloc.stop()
+
+        report["players"][f"{name} {m}x{n}/{k}"] = {
+            "games": games,
+            "won": outcomes[1],
+            "tied": outcomes[0],
+            "lost": outcomes[-1],
+            "win_rate": outcomes[1] / games,
+            "loss_rate": outcomes[-1] / games,
+            "moves": len(latencies),
+            "latency_ms": percentiles(latencies),
+            "nodes": {"mean": sum(nodes) / len(nodes), "max": max(nodes)},
+            "peak_kb": peak // 1024
+        }
+    return report
+
+
+def compare(report, baseline):
+    """
+    Returns a line for every metric of `report` that regressed from `baseline`.
+    """
+    regressions = []
+    for player, now in report["players"].items():
+        before = baseline["players"].get(player)
+        if before is None:
+            continue
+        if now["win_rate"] < before["win_rate"] - RATE_TOLERANCE:
+            regressions.append(
+                f"{player} win rate {before['win_rate']:.3f} -> {now['win_rate']:.3f}"
+            )
+        if now["loss_rate"] > before["loss_rate"] + RATE_TOLERANCE:
+            regressions.append(
+                f"{player} loss rate {before['loss_rate']:.3f} -> {now['loss_rate']:.3f}"
+            )
+        for name in ["p50", "p90", "p99"]:
+            value = now["latency_ms"][name]
+            old = before["latency_ms"][name]
+            if value > NOISE_MS and value > old * TOLERANCE:
+                regressions.append(f"{player} latency {name} {old:.3f} -> {value:.3f} ms")
+        if now["nodes"]["mean"] > before["nodes"]["mean"] * TOLERANCE:
+            regressions.append(
+                f"{player} nodes {before['nodes']['mean']:.1f} -> {now['nodes']['mean']:.1f}"
+            )
+        if now["peak_kb"] > before["peak_kb"] * TOLERANCE:
+            regressions.append(f"{player} peak memory {before['peak_kb']} -> {now['peak_kb']} KB")
+    return regressions
+
+
+def print_report(report):
+    print(f"{'player':22} {'win':>6} {'loss':>6} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'nodes':>9} {'peak KB':>8}")
+    for player, stats in report["players"].items():
+        latency = stats["latency_ms"]
+        print(f"{player:22} {stats['win_rate']:6.3f} {stats['loss_rate']:6.3f} "
+              f"{latency['p50']:8.3f} {latency['p90']:8.3f} {latency['p99']:8.3f} "
+              f"{stats['nodes']['mean']:9.1f} {stats['peak_kb']:8}")
+
+
+def main():
+    usage = ("Usage: python selfplay.py [--games N] [--seed S] [--output report.json]\n"
+             "                          [--baseline baseline.json] [--save-baseline]")
+    args = sys.argv[1:]
+    options = {"--games": str(GAMES), "--seed": "0", "--output": None, "--baseline": BASELINE}
+    save = "--save-baseline" in args
+    if save:
+        args.remove("--save-baseline")
+    while args:
+        if args[0] not in options or len(args) < 2:
+            sys.exit(usage)
+        options[args[0]] = args[1]
+        args = args[2:]
+    try:
+        games = int(options["--games"])
+        seed = int(options["--seed"])
+    except ValueError:
+        sys.exit(usage)
+    if games < 1:
+        sys.exit(usage)
+
+    report = benchmark(games, seed)
+    print_report(report)
+    if options["--output"] is not None:
+        with open(options["--output"], "w") as f:
+            json.dump(report, f, indent=2)
+
+    if save:
+        with open(options["--baseline"], "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {options['--baseline']}.")
+        return
+
+    try:
+        with open(options["--baseline"]) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print("No baseline to compare with.")
+        return
+    if (baseline["games"], baseline["seed"]) != (games, seed):
+        print(f"The baseline played {baseline['games']} games from seed {baseline['seed']}, "
+              "so the results may differ by chance.")
+    regressions = compare(report, baseline)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
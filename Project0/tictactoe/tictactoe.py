@@ -4,12 +4,74 @@ Tic Tac Toe Player
 import copy
 import random
 import math
+import os
+from collections import OrderedDict
 
 X = "X"
 O = "O"
 EMPTY = None
  
 moves = {}
+
+# Most positions the transposition table remembers before dropping the
+# least recently used one. The whole game has fewer than a thousand up
+# to symmetry, so the cap only matters for callers that shrink it.
+TABLE_SIZE = 4096
+
+# Maps canonical board keys to their minimax value, shared by every
+# minimax call for the life of the process
+transpositions = OrderedDict()
+
+# The 8 rotations and reflections of the board, each as the order to
+# read the cells of a flattened board in
+SYMMETRIES = [
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),
+    (8, 5, 2, 7, 4, 1, 6, 3, 0)
+]
+
+# Character for each cell in a board key
+MARKS = {X: "x", O: "o", EMPTY: "."}
+
+# Whether a remembered value is exact, or only a lower or upper bound
+# because alpha-beta stopped searching that board early
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Order the search tries moves in: center, corners, then edges, since
+# moves on more lines tend to be better and cut alpha-beta off sooner
+ORDER = [(1, 1), (0, 0), (0, 2), (2, 0), (2, 2), (0, 1), (1, 0), (1, 2), (2, 1)]
+
+# The lines of three through each cell, for checking only the last move
+LINES = {
+    (i, j): [
+        line for line in (
+            [[(r, c) for c in range(3)] for r in range(3)]
+            + [[(r, c) for r in range(3)] for c in range(3)]
+            + [[(0, 0), (1, 1), (2, 2)], [(0, 2), (1, 1), (2, 0)]]
+        )
+        if (i, j) in line
+    ]
+    for i in range(3) for j in range(3)
+}
+
+# Number of boards searched, for comparing the search modes
+nodes = 0
+
+# Solved positions written by build_book.py, next to this file
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+
+# Digit of each cell in a position's base-3 code
+DIGITS = {EMPTY: 0, X: 1, O: 2}
+
+# Book byte for a position the book has no move for
+NO_MOVE = 0xFF
      
 
 def initial_state():
@@ -138,41 +200,282 @@ def utility(board):
         return 0
     
 
+def board_key(board):
+    """
+    Returns the same string for a board and all its rotations and
+    reflections, which have the same minimax value.
+    """
+    cells = [MARKS[cell] for row in board for cell in row]
+    return min("".join([cells[k] for k in symmetry]) for symmetry in SYMMETRIES)
+
+
+def lookup(board):
+    """
+    Returns the remembered (value, bound) of a board and its key,
+    or None and the key.
+    """
+    key = board_key(board)
+    if key in transpositions:
+        transpositions.move_to_end(key)
+        return transpositions[key], key
+    return None, key
+
+
+def remember(key, v, bound=EXACT):
+    transpositions[key] = (v, bound)
+    if len(transpositions) > TABLE_SIZE:
+        transpositions.popitem(last=False)
+
+
+class Position():
+    """
+    A board that a search makes and unmakes moves on in place, instead
+    of copying it for every move. The player to move, the empty cells
+    and whether the game is over are kept up to date as it goes, rather
+    than counted again on every board.
+    """
+
+    def __init__(self, board):
+        self.board = [row[:] for row in board]
+        x_moves = sum(row.count(X) for row in board)
+        o_moves = sum(row.count(O) for row in board)
+        self.turn = O if x_moves > o_moves else X
+
+        # Empty cells, center first, then corners, then edges
+        self.empty = [(i, j) for i, j in ORDER if board[i][j] == EMPTY]
+
+        # The utility once the game is over, None until then
+        self.outcome = utility(board) if terminal(board) else None
+
+    def make(self, k):
+        """
+        Plays the k-th empty cell and returns it.
+        """
+        action = self.empty.pop(k)
+        i, j = action
+        self.board[i][j] = self.turn
+        if any(all(self.board[y][x] == self.turn for y, x in line) for line in LINES[action]):
+            self.outcome = 1 if self.turn == X else -1
+        elif not self.empty:
+            self.outcome = 0
+        self.turn = O if self.turn == X else X
+        return action
+
+    def unmake(self, k, action):
+        """
+        Takes back the move `make(k)` returned `action` for.
+        """
+        i, j = action
+        self.board[i][j] = EMPTY
+        self.empty.insert(k, action)
+        self.outcome = None
+        self.turn = O if self.turn == X else X
+
+
 def MaxValue(board):
+    return max_value(Position(board))
+
+
+def MinValue(board):
+    return min_value(Position(board))
+
+
+def AlphaBetaMax(board, alpha, beta):
+    return alpha_beta_max(Position(board), alpha, beta)
+
+
+def AlphaBetaMin(board, alpha, beta):
+    return alpha_beta_min(Position(board), alpha, beta)
+
+
+def max_value(position):
+
+    global nodes
+    nodes += 1
 
     v = -3
 
-    if terminal(board):
-        return utility(board)
-    
-    for action in actions(board):
+    if position.outcome is not None:
+        return position.outcome
 
-        v = max(MinValue(result(board, action)), v)
+    known, key = lookup(position.board)
+    if known is not None and known[1] == EXACT:
+        return known[0]
     
+    for k in range(len(position.empty)):
+
+        action = position.make(k)
+        v = max(min_value(position), v)
+        position.unmake(k, action)
+
+    remember(key, v)
     return v
 
-def MinValue(board):
+def min_value(position):
+
+    global nodes
+    nodes += 1
 
     v = 3
 
-    if terminal(board):
-        return utility(board)
+    if position.outcome is not None:
+        return position.outcome
+
+    known, key = lookup(position.board)
+    if known is not None and known[1] == EXACT:
+        return known[0]
     
-    for action in actions(board):
+    for k in range(len(position.empty)):
+
+        action = position.make(k)
+        v = min(max_value(position), v)
+        position.unmake(k, action)
 
-        v = min(MaxValue(result(board, action)), v)
+    remember(key, v)
     return v
-    
-def minimax(board):
+
+
+def alpha_beta_max(position, alpha, beta):
+    """
+    max_value that stops looking at moves once O would avoid this board
+    (the value reaches beta) or X has a win. The result is exact if it
+    is strictly between alpha and beta, otherwise only a bound.
+    """
+    global nodes
+    nodes += 1
+
+    if position.outcome is not None:
+        return position.outcome
+
+    known, key = lookup(position.board)
+    if known is not None:
+        known_v, bound = known
+        if (bound == EXACT or (bound == LOWER and known_v >= beta)
+                or (bound == UPPER and known_v <= alpha)):
+            return known_v
+
+    v = -3
+    start = alpha
+    for k in range(len(position.empty)):
+        action = position.make(k)
+        v = max(alpha_beta_min(position, alpha, beta), v)
+        position.unmake(k, action)
+        if v >= beta or v == 1:
+            break
+        alpha = max(alpha, v)
+
+    remember(key, v, UPPER if v <= start else LOWER if v >= beta else EXACT)
+    return v
+
+
+def alpha_beta_min(position, alpha, beta):
+    """
+    min_value that stops looking at moves once X would avoid this board
+    (the value reaches alpha) or O has a win.
+    """
+    global nodes
+    nodes += 1
+
+    if position.outcome is not None:
+        return position.outcome
+
+    known, key = lookup(position.board)
+    if known is not None:
+        known_v, bound = known
+        if (bound == EXACT or (bound == LOWER and known_v >= beta)
+                or (bound == UPPER and known_v <= alpha)):
+            return known_v
+
+    v = 3
+    start = beta
+    for k in range(len(position.empty)):
+        action = position.make(k)
+        v = min(alpha_beta_max(position, alpha, beta), v)
+        position.unmake(k, action)
+        if v <= alpha or v == -1:
+            break
+        beta = min(beta, v)
+
+    remember(key, v, LOWER if v >= start else UPPER if v <= alpha else EXACT)
+    return v
+
+
+def position_code(board):
+    """
+    Returns the base-3 number with one digit per cell, first cell lowest.
+    """
+    code = 0
+    for row in reversed(board):
+        for cell in reversed(row):
+            code = code * 3 + DIGITS[cell]
+    return code
+
+
+def load_book(path=BOOK_PATH):
+    """
+    Returns the opening book, or None if it has not been built.
+
+    The book has one byte per position code: the best move's cell
+    3 * i + j in the low four bits and its value plus one above them,
+    or NO_MOVE if the game is over or the position cannot be reached.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return data if len(data) == 3 ** 9 else None
+
+
+def book_move(board):
+    """
+    Returns the book's (action, value) for a board, or None.
+    """
+    if book is None:
+        return None
+    entry = book[position_code(board)]
+    if entry == NO_MOVE:
+        return None
+    cell = entry & 0xF
+    return (cell // 3, cell % 3), (entry >> 4) - 1
+
+
+def minimax(board, alpha_beta=True):
+    """
+    Returns the optimal action for the current player on the board.
+
+    Of several equally good actions, the last one in the order of
+    `actions(board)` is played. With `alpha_beta`, the search skips
+    moves that cannot change the result, but each root action is still
+    searched exactly when it could tie the best so far, so the same
+    action is played as without it.
+
+    Positions in the opening book are not searched at all.
+    """
+    known = book_move(board)
+    if known is not None:
+        return known[0]
 
     turn = player(board)
 
     moves = {}
 
+    position = Position(board)
+
     if turn == X:
         for action in actions(board):
-            v = MinValue(result(board, action))
-            moves.update({v : action})
+            k = position.empty.index(action)
+            position.make(k)
+            if alpha_beta:
+                # Only values at least as good as the best so far matter
+                best = max(moves, default=-2)
+                v = alpha_beta_min(position, best - 1, 3)
+            else:
+                best = -2
+                v = min_value(position)
+            position.unmake(k, action)
+            if v >= best:
+                moves.update({v : action})
 
         move = max(moves)
         return moves[move]
@@ -180,11 +483,21 @@ def minimax(board):
 
     if turn == O:
         for action in actions(board):
-            v = MaxValue(result(board, action))
-            moves.update({v : action})
+            k = position.empty.index(action)
+            position.make(k)
+            if alpha_beta:
+                best = min(moves, default=2)
+                v = alpha_beta_max(position, -3, best + 1)
+            else:
+                best = 2
+                v = max_value(position)
+            position.unmake(k, action)
+            if v <= best:
+                moves.update({v : action})
 
         move = min(moves)
         return moves[move]
-    
-    
 
+
+# Loaded once at import, so every move the book knows is a lookup
+book = load_book()
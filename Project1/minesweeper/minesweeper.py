@@ -1,5 +1,8 @@
 import itertools
 import random
+from collections import deque
+
+from probability import probabilities
 
 
 class Minesweeper():
@@ -91,9 +94,6 @@ class Sentence():
     and a count of the number of those cells which are mines.
     """
 
-    mines = set()
-    safes = set()
-
     def __init__(self, cells, count):
         self.cells = set(cells)
         self.count = count
@@ -108,34 +108,171 @@ class Sentence():
         """
         Returns the set of all cells in self.cells known to be mines.
         """
-        return Sentence.mines & self.cells
+        # Only the sentence itself is consulted, so sentences of
+        # different games never share what they know
+        if len(self.cells) == self.count:
+            return set(self.cells)
+        return set()
 
     def known_safes(self):
         """
         Returns the set of all cells in self.cells known to be safe.
         """
-        return Sentence.safes & self.cells
+        if self.count == 0:
+            return set(self.cells)
+        return set()
 
     def mark_mine(self, cell):
         """
         Updates internal knowledge representation given the fact that
         a cell is known to be a mine.
         """
-        # Remove the cell from the sentence and subtract the count by 1 and add the cell in known mines set
+        # Remove the cell from the sentence and subtract the count by 1
         if cell in self.cells:
             self.cells.discard(cell)
             self.count = self.count - 1
-            Sentence.mines.add(cell)
 
     def mark_safe(self, cell):
         """
         Updates internal knowledge representation given the fact that
         a cell is known to be safe.
         """
-        # Remove the cell from the sentence since it's not a mine and do nothing to the count. Add the cell in safe cells set
+        # Remove the cell from the sentence since it's not a mine and do nothing to the count
         if cell in self.cells:
             self.cells.discard(cell)
-            Sentence.safes.add(cell)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def key(self):
+        """
+        Returns a hashable (cells, count) that is equal for equal sentences.
+        """
+        return frozenset(self.cells), self.count
+
+    def members(self):
+        """
+        Returns the cells of the sentence as MinesweeperAI indexes them,
+        here as (i, j) tuples.
+        """
+        return self.cells
+
+    def is_subset(self, other):
+        """
+        Returns True if the cells are a proper subset of the cells of `other`.
+        """
+        return self.cells < other.cells
+
+    def minus(self, other):
+        """
+        Returns the sentence left of `other` once this subset of it is taken out.
+        """
+        return Sentence(other.cells - self.cells, other.count - self.count)
+
+
+class BitSentence():
+    """
+    Sentence with its cells as an integer bitmask, where bit
+    i * width + j is set if cell (i, j) is in the sentence, so that
+    comparing and subtracting sentences are single integer operations.
+    The positions of the set bits are kept too, since MinesweeperAI
+    indexes sentences by them.
+    """
+
+    def __init__(self, cells, count, width):
+        self.width = width
+        self.positions = [i * width + j for i, j in cells]
+        self.mask = 0
+        for position in self.positions:
+            self.mask |= 1 << position
+        self.count = count
+
+    @classmethod
+    def from_mask(cls, mask, count, width):
+        sentence = cls((), count, width)
+        sentence.mask = mask
+        while mask:
+            bit = mask & -mask
+            sentence.positions.append(bit.bit_length() - 1)
+            mask ^= bit
+        return sentence
+
+    @property
+    def cells(self):
+        return self.decode(self.mask)
+
+    def decode(self, mask):
+        """
+        Returns the set of (i, j) cells of the bits in `mask`.
+        """
+        cells = set()
+        while mask:
+            bit = mask & -mask
+            cells.add(divmod(bit.bit_length() - 1, self.width))
+            mask ^= bit
+        return cells
+
+    def __eq__(self, other):
+        return self.mask == other.mask and self.count == other.count
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    def __len__(self):
+        return len(self.positions)
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        if len(self) == self.count:
+            return self.cells
+        return set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        if self.count == 0:
+            return self.cells
+        return set()
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        position = cell[0] * self.width + cell[1]
+        if self.mask >> position & 1:
+            self.mask ^= 1 << position
+            self.positions.remove(position)
+            self.count -= 1
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        position = cell[0] * self.width + cell[1]
+        if self.mask >> position & 1:
+            self.mask ^= 1 << position
+            self.positions.remove(position)
+
+    def key(self):
+        return self.mask, self.count
+
+    def members(self):
+        """
+        Returns the bit positions of the cells, which is how
+        MinesweeperAI indexes them, without building any (i, j) tuples.
+        """
+        return self.positions
+
+    def is_subset(self, other):
+        return self.mask != other.mask and self.mask & other.mask == self.mask
+
+    def minus(self, other):
+        return BitSentence.from_mask(other.mask & ~self.mask, other.count - self.count, self.width)
 
 
 class MinesweeperAI():
@@ -143,12 +280,18 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, bitsets=False, total_mines=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Number of mines on the board, if the AI is told
+        self.total_mines = total_mines
+
+        # Whether sentences are BitSentences rather than Sentences
+        self.bitsets = bitsets
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -156,8 +299,70 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, by their key(),
+        # so a sentence is only known once
+        self.knowledge = {}
+
+        # The keys of the sentences each cell appears in, by the cell's
+        # slot: the cell itself, or its bit position for BitSentences
+        self.containing = {}
+
+        # Keys of sentences added or changed since they were last inferred from
+        self.pending = deque()
+
+        # Components of the knowledge base whose mine assignments were
+        # counted for the last random move, by their constraints
+        self.components = {}
+
+    def sentence(self, cells, count):
+        """
+        Returns a new sentence of the kind this AI keeps.
+        """
+        if self.bitsets:
+            return BitSentence(cells, count, self.width)
+        return Sentence(cells, count)
+
+    def slot(self, cell):
+        """
+        Returns what `containing` is keyed by for `cell`.
+        """
+        if self.bitsets:
+            return cell[0] * self.width + cell[1]
+        return cell
+
+    def cell(self, slot):
+        """
+        Returns the (i, j) cell of a slot of `containing`.
+        """
+        if self.bitsets:
+            return divmod(slot, self.width)
+        return slot
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base unless it is empty or
+        already known, and queues it to be inferred from.
+        """
+        key = sentence.key()
+        if not len(sentence) or key in self.knowledge:
+            return
+        self.knowledge[key] = sentence
+        for slot in sentence.members():
+            self.containing.setdefault(slot, set()).add(key)
+        self.pending.append(key)
+
+    def remove_sentence(self, key):
+        """
+        Removes the sentence with `key` from the knowledge base and returns it.
+        """
+        sentence = self.knowledge.pop(key)
+        for slot in sentence.members():
+            keys = self.containing.get(slot)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.containing[slot]
+        return sentence
 
     def mark_mine(self, cell):
         """
@@ -165,8 +370,12 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        # Only the sentences with the cell change, and they are
+        # filed again under their new cells and count
+        for key in list(self.containing.get(self.slot(cell), ())):
+            sentence = self.remove_sentence(key)
             sentence.mark_mine(cell)
+            self.add_sentence(sentence)
 
     def mark_safe(self, cell):
         """
@@ -174,9 +383,10 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        print(cell)
-        for sentence in self.knowledge:
+        for key in list(self.containing.get(self.slot(cell), ())):
+            sentence = self.remove_sentence(key)
             sentence.mark_safe(cell)
+            self.add_sentence(sentence)
 
     def add_knowledge(self, cell, count):
         """
@@ -201,74 +411,60 @@ class MinesweeperAI():
         x = cell[0]
         y = cell[1]
 
-
-        # 3 Finding the neighbours of the given cell
+        # 3 Finding the neighbours of the given cell that are still unknown,
+        # taking the mines already found off the count
         neighbour_cells = set()
 
         for i in range(-1, 2):
             for j in range(-1, 2):
-                
-                # To check if the cell is an unknown cell
-                if (x + i, y + j) in self.moves_made:
-                    continue
-
-                if 0 <= (x + i) < self.height and 0 <= (y + j) < self.width:
-                    neighbour_cells.add((x + i, y + j))
-
-        
-        # Add the set of cells and the associated count
-        self.knowledge.append(Sentence(neighbour_cells, count))
-
-        # Check for subsets and supersets and create new inferences
-
-
-        for first_sentence in self.knowledge:
-
-            for second_sentence in self.knowledge:
-                
+                neighbour = (x + i, y + j)
 
-                if first_sentence == second_sentence:
+                if not (0 <= neighbour[0] < self.height and 0 <= neighbour[1] < self.width):
                     continue
 
-                if first_sentence.cells > second_sentence.cells:
+                if neighbour in self.mines:
+                    count -= 1
+                elif neighbour not in self.safes:
+                    neighbour_cells.add(neighbour)
 
-                    sent = Sentence(first_sentence.cells - second_sentence.cells,
-                                    first_sentence.count - second_sentence.count)
-                    
-                    if sent not in self.knowledge:
-                        self.knowledge.append(sent)
-
-
-        # Mark new cells as safe or mines in  newly formed sentences
+        # Add the set of cells and the associated count
+        self.add_sentence(self.sentence(neighbour_cells, count))
+
+        # 4, 5 Infer from every sentence added or changed until nothing new
+        # follows. Only sentences sharing a cell can be subsets of each other,
+        # so each one is only compared with those.
+        while self.pending:
+            key = self.pending.popleft()
+            if key not in self.knowledge:
+                # Changed or dropped since it was queued
+                continue
+            sentence = self.knowledge[key]
+            slots = list(sentence.members())
 
-        helper = set()
-        for sentence in self.knowledge:
-            
             # If the number of cells equals to the number of mines present that means every cell is a mine
-            if len(sentence.cells) == sentence.count:
-
-                # Using a helper set to prevent dynamic deletion of cells from the set
-                for each_cell in sentence.cells:    
-                    helper.add(each_cell)
-                
-                self.knowledge.remove(sentence)
-
-                
-                for each_cell in helper:
-                    self.mark_mine(each_cell)
+            if len(sentence) == sentence.count:
+                for slot in slots:
+                    self.mark_mine(self.cell(slot))
                 continue
 
-
             # If the count of mines in the sentence is 0 that means all the cells are safe
             if sentence.count == 0:
-                
-                for each_cell in sentence.cells:
-                    helper.add(each_cell)
-                
-                self.knowledge.remove(sentence)
-                
-                for each_cell in helper:
-                    self.mark_safe(each_cell)
+                for slot in slots:
+                    self.mark_safe(self.cell(slot))
+                continue
+
+            # Check for subsets and supersets and create new inferences
+            neighbours = set()
+            for slot in slots:
+                neighbours |= self.containing[slot]
+            neighbours.discard(key)
+
+            for other_key in neighbours:
+                other = self.knowledge[other_key]
+                if other.is_subset(sentence):
+                    self.add_sentence(other.minus(sentence))
+                elif sentence.is_subset(other):
+                    self.add_sentence(sentence.minus(other))
 
     def make_safe_move(self):
         """
@@ -279,7 +475,6 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        print(Sentence.safes - self.moves_made)
         for safe_move in self.safes:
             if safe_move not in self.moves_made:
                 return safe_move
@@ -292,11 +487,32 @@ class MinesweeperAI():
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        Among those, it chooses randomly among the cells least likely to
+        be a mine given the knowledge base, or returns None if there are none.
         """
-        while 1:
-
-            x = random.randint(0, self.height - 1)
-            y = random.randint(0, self.width - 1)
-
-            if (x, y) not in self.mines and (x, y) not in self.moves_made:
-                return x, y
+        candidates = [
+            (i, j) for i in range(self.height) for j in range(self.width)
+            if (i, j) not in self.mines and (i, j) not in self.moves_made
+        ]
+        if not candidates:
+            return None
+
+        safe = [cell for cell in candidates if cell in self.safes]
+        if safe:
+            return random.choice(safe)
+
+        # Cells are passed by their slots, so BitSentences are not decoded
+        constraints = [
+            (frozenset(sentence.members()), sentence.count)
+            for sentence in self.knowledge.values()
+        ]
+        mines = None
+        if self.total_mines is not None:
+            mines = self.total_mines - len(self.mines)
+        slots = [self.slot(cell) for cell in candidates]
+        risk = probabilities(constraints, slots, mines, self.components)
+
+        lowest = min(risk.values())
+        return random.choice([
+            cell for cell, slot in zip(candidates, slots) if risk[slot] <= lowest + 1e-9
+        ])
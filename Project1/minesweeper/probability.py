@@ -0,0 +1,248 @@
+"""
+Mine probabilities for Minesweeper
+
+Every sentence the AI knows constrains how many mines its cells hold.
+Sentences that share cells form a component, and the assignments of
+mines to one component do not depend on the others. Each component's
+assignments are enumerated by backtracking and counted by how many
+mines they place. The components are then combined, weighting every
+combination of counts by the ways the mines left over can be spread
+across the cells no sentence mentions.
+"""
+import math
+import random
+from fractions import Fraction
+
+# Components with more cells than this are sampled instead of enumerated
+CAP = 16
+
+# Assignments drawn from a component that is too big to enumerate
+SAMPLES = 100
+
+# Cells a sample may assign, backtracking included, before it is given up
+SAMPLE_STEPS = 1000
+
+# Mine density assumed when the number of mines on the board is unknown,
+# about that of the beginner, intermediate and expert boards
+DENSITY = Fraction(3, 20)
+
+
+def components(constraints):
+    """
+    Splits `constraints`, a list of (frozenset of cells, count), into
+    lists of constraints that share cells, directly or through others.
+    """
+    parent = list(range(len(constraints)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for i, (cells, count) in enumerate(constraints):
+        for cell in cells:
+            if cell in owner:
+                parent[find(i)] = find(owner[cell])
+            else:
+                owner[cell] = i
+
+    groups = {}
+    for i, constraint in enumerate(constraints):
+        groups.setdefault(find(i), []).append(constraint)
+    return list(groups.values())
+
+
+class Component():
+    """
+    The assignments of mines to the cells of one component: for every
+    number k of mines, how many assignments place k mines and how many
+    of those put a mine on each cell.
+    """
+
+    def __init__(self, constraints, rng=random):
+        # Order the cells constraint by constraint, breadth first from the
+        # smallest, so that constraints are filled in, and fail, early
+        containing = {}
+        for c, (cells, count) in enumerate(constraints):
+            for cell in cells:
+                containing.setdefault(cell, []).append(c)
+        start = min(range(len(constraints)), key=lambda c: len(constraints[c][0]))
+        queue = [start]
+        queued = {start}
+        index = {}
+        self.cells = []
+        for c in queue:
+            for cell in sorted(constraints[c][0] - index.keys()):
+                index[cell] = len(self.cells)
+                self.cells.append(cell)
+                for other in containing[cell]:
+                    if other not in queued:
+                        queued.add(other)
+                        queue.append(other)
+
+        # For each constraint, the mines it still needs and its cells left unassigned
+        self.need = [count for cells, count in constraints]
+        self.left = [len(cells) for cells, count in constraints]
+        self.touching = [[] for cell in self.cells]
+        for c, (cells, count) in enumerate(constraints):
+            for cell in cells:
+                self.touching[index[cell]].append(c)
+
+        # counts[k] is [assignments, mines on each cell] with k mines
+        self.counts = {}
+        self.assignment = [0] * len(self.cells)
+        if len(self.cells) <= CAP:
+            self.exact = True
+            self.enumerate(0, 0)
+        else:
+            self.exact = False
+            for sample in range(SAMPLES):
+                self.steps = SAMPLE_STEPS
+                self.sample(0, 0, rng)
+
+    def assign(self, i, value):
+        """
+        Assigns `value` to cell i and returns whether every constraint
+        can still be met.
+        """
+        self.assignment[i] = value
+        feasible = True
+        for c in self.touching[i]:
+            self.need[c] -= value
+            self.left[c] -= 1
+            if not 0 <= self.need[c] <= self.left[c]:
+                feasible = False
+        return feasible
+
+    def unassign(self, i, value):
+        for c in self.touching[i]:
+            self.need[c] += value
+            self.left[c] += 1
+
+    def record(self, mines):
+        if mines not in self.counts:
+            self.counts[mines] = [0, [0] * len(self.cells)]
+        entry = self.counts[mines]
+        entry[0] += 1
+        for i, value in enumerate(self.assignment):
+            entry[1][i] += value
+
+    def enumerate(self, i, mines):
+        """
+        Records every assignment of the cells from i on that meets every constraint.
+        """
+        if i == len(self.cells):
+            self.record(mines)
+            return
+        for value in (0, 1):
+            if self.assign(i, value):
+                self.enumerate(i + 1, mines + value)
+            self.unassign(i, value)
+
+    def sample(self, i, mines, rng):
+        """
+        Records the first assignment found trying values in a random
+        order, and returns whether there was one within the steps left.
+        """
+        if i == len(self.cells):
+            self.record(mines)
+            return True
+        self.steps -= 1
+        if self.steps < 0:
+            return False
+        first = rng.randrange(2)
+        for value in (first, 1 - first):
+            found = self.assign(i, value) and self.sample(i + 1, mines + value, rng)
+            self.unassign(i, value)
+            if found or self.steps < 0:
+                return found
+        return False
+
+
+def convolve(first, second):
+    """
+    Returns the weights of every total of mines of two independent
+    weightings, each a dict from a number of mines to a weight.
+    """
+    total = {}
+    for a, x in first.items():
+        for b, y in second.items():
+            total[a + b] = total.get(a + b, 0) + x * y
+    return total
+
+
+def probabilities(constraints, unknown, mines=None, cache=None, rng=random):
+    """
+    Returns the probability that each cell of `unknown` is a mine.
+
+    `constraints` is a list of (frozenset of cells, count) over the cells
+    of `unknown`, `mines` the number of mines among `unknown`, if known.
+    `cache` maps the constraints of a component to its Component, so a
+    component unchanged since the last call is not enumerated again; it
+    is left holding only the components used this time.
+    """
+    groups = components(constraints)
+    found = {}
+    for group in groups:
+        key = frozenset(group)
+        found[key] = cache[key] if cache is not None and key in cache else Component(group, rng)
+    if cache is not None:
+        cache.clear()
+        cache.update(found)
+    parts = [found[frozenset(group)] for group in groups]
+
+    # Weight every number of mines on the cells no constraint mentions
+    rest = len(unknown) - sum(len(part.cells) for part in parts)
+    if mines is None:
+        # Mines independent of each other, as a ratio of odds in lowest
+        # terms so the weights stay integers
+        odds = (DENSITY / (1 - DENSITY)).as_integer_ratio()
+        limit = rest + sum(len(part.cells) for part in parts)
+
+        def outside(placed):
+            return odds[0] ** placed * odds[1] ** (limit - placed)
+
+        def density(placed):
+            return float(DENSITY)
+    else:
+        def outside(placed):
+            return math.comb(rest, mines - placed) if 0 <= mines - placed <= rest else 0
+
+        def density(placed):
+            return (mines - placed) / rest if rest else 0
+
+    # A component no sample could be drawn from is left out of the weights
+    weights = [{k: entry[0] for k, entry in part.counts.items()} or {0: 1} for part in parts]
+    result = {}
+
+    # Each component, weighted by every way the others and the rest can go
+    for p, part in enumerate(parts):
+        others = {0: 1}
+        for q, weight in enumerate(weights):
+            if q != p:
+                others = convolve(others, weight)
+        total = 0
+        mined = [0] * len(part.cells)
+        for k, (count, cell_counts) in part.counts.items():
+            factor = sum(w * outside(k + s) for s, w in others.items())
+            total += count * factor
+            for i, cell_count in enumerate(cell_counts):
+                mined[i] += cell_count * factor
+        for i, cell in enumerate(part.cells):
+            result[cell] = mined[i] / total if total else 0.5
+
+    # Every cell no constraint mentions is as likely as any other
+    if rest:
+        combined = {0: 1}
+        for weight in weights:
+            combined = convolve(combined, weight)
+        total = sum(w * outside(s) for s, w in combined.items())
+        risk = 0
+        if total:
+            risk = sum(w * outside(s) * density(s) for s, w in combined.items()) / total
+        for cell in unknown:
+            if cell not in result:
+                result[cell] = risk
+    return result
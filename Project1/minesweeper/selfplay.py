@@ -0,0 +1,177 @@
+"""
+Headless self-play benchmark for MinesweeperAI
+
+Usage: python selfplay.py [games] [--save-baseline]
+
+Plays seeded games on beginner, intermediate and expert boards without
+pygame, with the AI keeping Sentences and then BitSentences, and prints
+a JSON report of the win rate, the latency of each move, the size of
+the knowledge base and the peak memory of a game on every board. The
+report is checked against selfplay_baseline.json, and the exit status
+is 1 if anything regressed, unless it is saved as the new baseline.
+"""
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# (height, width, mines) of the boards played
+BOARDS = [(8, 8, 8), (16, 16, 40), (16, 30, 99)]
+
+# Games played on each board by default, seeded 0, 1, 2, ...
+GAMES = 1000
+
+# Games per board played again under tracemalloc for the peak memory,
+# which slows everything down too much to time the others with it on
+MEMORY_GAMES = 20
+
+# Baseline stored next to this file
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "selfplay_baseline.json")
+
+# How much worse than the baseline a metric may get before it counts
+# as a regression: a factor for costs, a difference for the win rate.
+# Latencies below NOISE_MS are too short to compare.
+TOLERANCE = 1.25
+WIN_RATE_TOLERANCE = 0.05
+NOISE_MS = 0.05
+
+
+def play(height, width, mines, seed, bitsets):
+    """
+    Plays one game and returns whether it was won, the milliseconds each
+    move took, choosing it and taking in what it revealed, and the
+    largest number of sentences the AI knew.
+    """
+    random.seed(seed)
+
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, bitsets=bitsets, total_mines=mines)
+
+    latencies = []
+    knowledge = 0
+    while len(ai.moves_made) < height * width - mines:
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            if move is None:
+                # Every cell left is wrongly believed to be a mine
+                return False, latencies, knowledge
+        if game.is_mine(move):
+            latencies.append((time.perf_counter() - start) * 1000)
+            return False, latencies, knowledge
+        ai.add_knowledge(move, game.nearby_mines(move))
+        latencies.append((time.perf_counter() - start) * 1000)
+        knowledge = max(knowledge, len(ai.knowledge))
+    return True, latencies, knowledge
+
+
+def measure(height, width, mines, bitsets, games):
+    """
+    Returns the results of `games` games on one board.
+    """
+    won = 0
+    latencies = []
+    knowledge = []
+    for seed in range(games):
+        result, game_latencies, game_knowledge = play(height, width, mines, seed, bitsets)
+        won += result
+        latencies.extend(game_latencies)
+        knowledge.append(game_knowledge)
+
+    peak = 0
+    tracemalloc.start()
+    for seed in range(min(games, MEMORY_GAMES)):
+        gc.collect()
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        play(height, width, mines, seed, bitsets)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+    tracemalloc.stop()
+
+    latencies.sort()
+    at = {name: latencies[int(fraction * (len(latencies) - 1))]
+          for name, fraction in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1)]}
+    return {
+        "games": games,
+        "won": won,
+        "win_rate": won / games,
+        "moves": len(latencies),
+        "latency_ms": at,
+        "knowledge": {"mean": sum(knowledge) / games, "max": max(knowledge)},
+        "peak_kb": peak // 1024
+    }
+
+
+def regressions(report, baseline):
+    """
+    Yields a line for every metric of `report` that regressed from `baseline`.
+    """
+    for board, now in report["boards"].items():
+        before = baseline["boards"].get(board)
+        if before is None:
+            continue
+        if now["win_rate"] < before["win_rate"] - WIN_RATE_TOLERANCE:
+            yield f"{board} win rate {before['win_rate']:.3f} -> {now['win_rate']:.3f}"
+        for name in ["p50", "p90", "p99"]:
+            old, new = before["latency_ms"][name], now["latency_ms"][name]
+            if new > max(NOISE_MS, old * TOLERANCE):
+                yield f"{board} latency {name} {old:.3f} -> {new:.3f} ms"
+        for name, old, new in [
+            ("knowledge", before["knowledge"]["max"], now["knowledge"]["max"]),
+            ("peak KB", before["peak_kb"], now["peak_kb"])
+        ]:
+            if new > old * TOLERANCE:
+                yield f"{board} {name} {old} -> {new}"
+
+
+def main():
+    usage = "Usage: python selfplay.py [games] [--save-baseline]"
+    args = sys.argv[1:]
+    save = "--save-baseline" in args
+    if save:
+        args.remove("--save-baseline")
+    if len(args) > 1:
+        sys.exit(usage)
+    try:
+        games = int(args[0]) if args else GAMES
+    except ValueError:
+        sys.exit(usage)
+    if games < 1:
+        sys.exit(usage)
+
+    report = {
+        "ai": "minesweeper",
+        "games": games,
+        "seed": 0,
+        "python": sys.version.split()[0],
+        "boards": {}
+    }
+    for height, width, mines in BOARDS:
+        for bitsets in [False, True]:
+            name = f"{height}x{width}/{mines}" + (" bitsets" if bitsets else "")
+            report["boards"][name] = measure(height, width, mines, bitsets, games)
+    print(json.dumps(report, indent=2))
+
+    if save:
+        with open(BASELINE, "w") as f:
+            json.dump(report, f, indent=2)
+        return
+
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    if baseline["games"] != games:
+        print(f"The baseline played {baseline['games']} games, "
+              "so the results may differ by chance.", file=sys.stderr)
+    found = list(regressions(report, baseline))
+    if found:
+        sys.exit("\n".join(f"Regression: {line}" for line in found))
+
+
+if __name__ == "__main__":
+    main()